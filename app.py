@@ -1,116 +1,695 @@
-from flask import Flask, render_template, request, send_file, redirect, url_for, flash
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
+from flask import Flask, Response, render_template, request, send_file, redirect, url_for, flash, jsonify, abort, g
+from concurrent.futures.process import BrokenProcessPool
+import click
 import os
 import io
 import json
+import re
+import tempfile
+import threading
+import time
 import psycopg2
+from bulkexport import iter_drafts, render_many, stream_zip
+from bulkimport import IMPORT_MODES, delete_drafts, import_drafts, read_jsonl, read_names
+from dbpool import ConnectionPool
+from draftcache import CHANNEL, ChangeListener, DraftCache, install_change_trigger
+from draftsearch import backfill_search_vector, install_search, search_drafts_query, search_result
+from formschema import FORM, html_blocks
+import htmlrender
+import metrics
+from metrics import SamplingProfiler, histogram, timed
+from migrations import content_column_type, create_content_index, migrate_content_to_jsonb
+from pdfcache import PDFCache
+from pdfrender import OUTPUT_PROFILE, OUTPUT_PROFILES, PDF_RENDERER, RENDERERS, render_variant, write_pdf
+from renderjobs import QueueFull, RenderJobQueue
+from revisions import (
+    diff_revisions, install_revision_trigger, list_revisions_query, rebuild_revision, revision_chain_query,
+    revision_summary,
+)
+from staticassets import IMMUTABLE_CACHE_CONTROL, StaticAssets, compress, compressible, negotiate_encoding
+from textlayout import measure_cache_info
+from thumbnails import ThumbnailQueue
 
-app = Flask(__name__)
-def get_db_connection():
-    return psycopg2.connect(os.environ.get("DATABASE_URL"))
+# Static files are served by static_file() below, from the startup manifest.
+app = Flask(__name__, static_folder=None)
+db_pool = ConnectionPool(
+    os.environ.get("DATABASE_URL"),
+    minconn=int(os.environ.get("DB_POOL_MIN", 1)),
+    maxconn=int(os.environ.get("DB_POOL_MAX", 5)),
+    timeout=float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+)
+
+def db_connection():
+    return db_pool.connection()
+
+pdf_cache = PDFCache(
+    memory_bytes=int(os.environ.get("PDF_CACHE_MEMORY_BYTES", 64 * 1024 * 1024)),
+    disk_dir=os.environ.get("PDF_CACHE_DIR"),
+    disk_bytes=int(os.environ.get("PDF_CACHE_DISK_BYTES", 512 * 1024 * 1024)),
+)
+
+# Read cache for drafts and /drafts pages. This worker's own writes invalidate
+# it immediately; writes from other workers (or anything else touching the
+# table) arrive over LISTEN/NOTIFY. With DRAFT_CACHE_LISTEN off, other
+# workers' writes only show up once DRAFT_CACHE_TTL has passed.
+DRAFT_CACHE_SIZE = int(os.environ.get("DRAFT_CACHE_SIZE", 1024))
+draft_cache = None
+draft_listener = None
+if DRAFT_CACHE_SIZE > 0:
+    draft_cache = DraftCache(
+        max_entries=DRAFT_CACHE_SIZE,
+        max_lists=int(os.environ.get("DRAFT_CACHE_LISTS", 256)),
+        ttl=float(os.environ.get("DRAFT_CACHE_TTL", 30)),
+    )
+    if os.environ.get("DRAFT_CACHE_LISTEN", "1") not in ("0", "false", "no"):
+        draft_listener = ChangeListener(os.environ.get("DATABASE_URL"), CHANNEL,
+                                        draft_cache.apply_notification, draft_cache.clear)
+
+def draft_cache_active():
+    """True if cached reads are safe right now (the listener, if any, is connected)."""
+    if draft_cache is None:
+        return False
+    return draft_listener is None or draft_listener.ensure_running()
+
+def invalidate_draft(name, membership=True):
+    if draft_cache is not None:
+        draft_cache.invalidate(name, membership)
+
+# Setting RENDER_JOBS_DIR turns on queued rendering: /submit returns a job id
+# and the PDF is rendered on a local process pool instead of in the request.
+render_jobs = None
+if os.environ.get("RENDER_JOBS_DIR"):
+    render_jobs = RenderJobQueue(
+        os.environ["RENDER_JOBS_DIR"],
+        max_workers=int(os.environ.get("RENDER_JOBS_WORKERS", 0)) or None,
+        max_pending=int(os.environ.get("RENDER_JOBS_MAX_PENDING", 16)),
+    )
+# First-page PNG thumbnails, rendered on THUMBNAIL_WORKERS background
+# processes per worker when a draft is saved and stored by content hash
+# (THUMBNAIL_CACHE_DIR shares them between workers). 0 turns them off.
+thumbnail_cache = PDFCache(
+    memory_bytes=int(os.environ.get("THUMBNAIL_CACHE_MEMORY_BYTES", 8 * 1024 * 1024)),
+    disk_dir=os.environ.get("THUMBNAIL_CACHE_DIR"),
+    disk_bytes=int(os.environ.get("THUMBNAIL_CACHE_DISK_BYTES", 64 * 1024 * 1024)),
+    suffix=".png",
+)
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", 1))
+thumbnail_queue = None
+if THUMBNAIL_WORKERS > 0:
+    thumbnail_queue = ThumbnailQueue(
+        thumbnail_cache,
+        lambda name: load_draft_with_version(name),
+        width=int(os.environ.get("THUMBNAIL_WIDTH", 240)),
+        max_workers=THUMBNAIL_WORKERS,
+        max_pending=int(os.environ.get("THUMBNAIL_MAX_PENDING", 64)),
+    )
+
+def schedule_thumbnail(name):
+    """Render a fresh thumbnail of a just-written draft in the background."""
+    if thumbnail_queue is not None:
+        thumbnail_queue.schedule(name)
+
+PDF_SPOOL_BYTES = int(os.environ.get("PDF_SPOOL_BYTES", 2 * 1024 * 1024))
+DRAFTS_PAGE_SIZE = 50
+MAX_DRAFTS_PAGE_SIZE = 200
+REVISIONS_PAGE_SIZE = 50
+SEARCH_PAGE_SIZE = 20
+LIKE_ESCAPE = re.compile(r"[\\%_]")
+AUTOSAVE_IGNORED_FIELDS = ("action", "draft_name")
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 0)) or None
+# Sampling profiler: requests sent with an "X-Profile: 1" header are profiled
+# when PROFILE_REQUESTS is on; PROFILE_ALL_REQUESTS profiles every request.
+PROFILE_REQUESTS = os.environ.get("PROFILE_REQUESTS", "0") not in ("0", "false", "no")
+PROFILE_ALL_REQUESTS = os.environ.get("PROFILE_ALL_REQUESTS", "0") not in ("0", "false", "no")
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or tempfile.gettempdir()
+REQUEST_SECONDS = histogram("http_request_duration_seconds", "Time to build each response, by endpoint.")
+DB_SECONDS = histogram("db_query_seconds", "Time spent in each draft helper, including pool checkout.")
+SEND_SECONDS = histogram("pdf_send_seconds", "Time to build the PDF download response.")
+COMPRESS_SECONDS = histogram("http_compress_seconds", "Time spent compressing response bodies.")
+# Text responses at least COMPRESS_MIN_BYTES long are sent brotli- or
+# gzip-compressed when the client accepts it. Static files are fingerprinted
+# and pre-compressed once here; fingerprinted URLs are cached for a year,
+# plain ones for STATIC_MAX_AGE seconds.
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 512))
+STATIC_DIR = os.path.join(app.root_path, "static")
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", 300))
+static_assets = StaticAssets(STATIC_DIR).build()
+app.jinja_env.globals.update(form_schema=FORM, html_blocks=html_blocks)
 app.secret_key = 'your_secret_key_here'
 DB_FILE = 'drafts.db'
 
 def init_db():
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS drafts (
-            id SERIAL PRIMARY KEY,
-            name TEXT UNIQUE NOT NULL,
-            content TEXT NOT NULL
-        )
-    """)
-    conn.commit()
-    conn.close()
-
-init_db()
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS drafts (
+                id SERIAL PRIMARY KEY,
+                name TEXT UNIQUE NOT NULL,
+                content JSONB NOT NULL
+            )
+        """)
+        # Bumped on every write; autosave uses it for optimistic concurrency.
+        c.execute("ALTER TABLE drafts ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1")
+        install_change_trigger(conn)
+        content_type = content_column_type(conn)
+        if content_type == "jsonb":
+            install_revision_trigger(conn)
+    if content_type == "jsonb":
+        create_content_index(db_connection)
+        install_search(db_connection)
+    else:
+        app.logger.error("drafts.content is %s; run 'flask migrate-jsonb' to convert it", content_type)
+    # Trigram index so substring/prefix search over names doesn't scan the
+    # table. pg_trgm may need superuser rights; search still works without it.
+    try:
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            c.execute("CREATE INDEX IF NOT EXISTS drafts_name_trgm_idx ON drafts USING gin (name gin_trgm_ops)")
+    except psycopg2.Error:
+        app.logger.warning("pg_trgm unavailable; draft name search will not be indexed")
+
+# Nothing touches the database at import time. Deployments run
+# 'flask init-db' once; with AUTO_INIT_DB on (the default, handy for local
+# development) the first request that needs the database runs it instead.
+AUTO_INIT_DB = os.environ.get("AUTO_INIT_DB", "1") not in ("0", "false", "no")
+NO_DB_ENDPOINTS = ("healthz", "readyz", "metrics_endpoint", "static")
+_db_initialized = False
+_db_init_lock = threading.Lock()
+
+@app.before_request
+def lazy_init_db():
+    global _db_initialized
+    if _db_initialized or not AUTO_INIT_DB or request.endpoint in NO_DB_ENDPOINTS:
+        return
+    with _db_init_lock:
+        if not _db_initialized:
+            init_db()
+            _db_initialized = True
+
+def schema_error(content_type):
+    """Why the drafts table can't serve requests yet (given its content column type), or None."""
+    if content_type is None:
+        return "drafts schema not initialized; run 'flask init-db'"
+    if content_type != "jsonb":
+        return f"drafts.content is {content_type}; run 'flask migrate-jsonb'"
+    return None
+
+# Draft routes assume JSONB content; until the column has been migrated they
+# answer 503 with what to run instead of failing on TEXT rows.
+_schema_ready = False
+
+@app.before_request
+def require_jsonb_content():
+    global _schema_ready
+    if _schema_ready or request.endpoint in NO_DB_ENDPOINTS:
+        return
+    with db_connection() as conn:
+        error = schema_error(content_column_type(conn))
+    if error:
+        abort(503, error)
+    _schema_ready = True
+
+# --- SQL shared with the async serving mode (asgi.py) ---
+# JSON parameters are bound as serialised text with an explicit ::jsonb cast,
+# so the same statements work with psycopg2 and with psycopg 3.
+SELECT_DRAFT_SQL = "SELECT content, version FROM drafts WHERE name = %s"
+LOCK_DRAFT_SQL = "SELECT content FROM drafts WHERE name = %s FOR UPDATE"
+UPSERT_DRAFT_SQL = """
+    INSERT INTO drafts (name, content)
+    VALUES (%s, %s::jsonb)
+    ON CONFLICT (name)
+    DO UPDATE SET content = EXCLUDED.content, version = drafts.version + 1
+"""
+CREATE_DRAFT_SQL = """
+    INSERT INTO drafts (name, content) VALUES (%s, %s::jsonb)
+    ON CONFLICT (name) DO NOTHING
+    RETURNING version
+"""
+DELETE_DRAFT_SQL = "DELETE FROM drafts WHERE name = %s"
+
+def update_fields_query(name, changed, removed=(), expected_version=None):
+    query = """
+        UPDATE drafts SET content = (content || %s::jsonb) - %s::text[], version = version + 1
+        WHERE name = %s
+    """
+    params = [json.dumps(changed), list(removed), name]
+    if expected_version is not None:
+        query += " AND version = %s"
+        params.append(expected_version)
+    return query + " RETURNING version", params
+
+def draft_names_query(after=None, limit=None, search=None, fields=None):
+    clauses = []
+    params = []
+    if fields:
+        clauses.append("content @> %s::jsonb")
+        params.append(json.dumps(fields))
+    if after:
+        clauses.append("name > %s")
+        params.append(after)
+    if search:
+        clauses.append("name ILIKE %s")
+        params.append("%" + LIKE_ESCAPE.sub(r"\\\g<0>", search) + "%")
+    query = "SELECT name FROM drafts"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY name"
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+def page_limit(args, default):
+    """The ?limit= of a paged listing, clamped to 1..MAX_DRAFTS_PAGE_SIZE."""
+    return max(1, min(args.get("limit", default, type=int), MAX_DRAFTS_PAGE_SIZE))
+
+def draft_names_cache_key(after, limit, search, fields):
+    # Content filters first: DraftCache drops those pages on every write.
+    return (tuple(sorted((fields or {}).items())), after, limit, search)
 
 # --- Helper functions for DB ---
+@timed(DB_SECONDS, op="save")
 def save_draft_to_db(name, content_dict):
-    conn = get_db_connection()
-    c = conn.cursor()
-    json_data = json.dumps(content_dict)
-    c.execute("""
-        INSERT INTO drafts (name, content)
-        VALUES (%s, %s)
-        ON CONFLICT (name)
-        DO UPDATE SET content = EXCLUDED.content
-    """, (name, json_data))
-    conn.commit()
-    conn.close()
+    """Save a draft, writing only the fields that differ from the stored copy."""
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(LOCK_DRAFT_SQL, (name,))
+        row = c.fetchone()
+        if row is None:
+            c.execute(UPSERT_DRAFT_SQL, (name, json.dumps(content_dict)))
+        else:
+            changed, removed = field_delta(row[0], content_dict)
+            if not changed and not removed:
+                return
+            update_draft_fields(name, changed, removed, conn=conn)
+    invalidate_draft(name, membership=row is None)
+    schedule_thumbnail(name)
 
-def load_draft_from_db(name):
-    conn = get_db_connection()
+def field_delta(old, new):
+    """Return ({field: value} changed or added, [fields] removed) between two drafts."""
+    changed = {k: v for k, v in new.items() if old.get(k) != v}
+    removed = [k for k in old if k not in new]
+    return changed, removed
+
+def update_draft_fields(name, changed, removed=(), conn=None, expected_version=None):
+    """Merge `changed` into a draft's JSONB content and drop `removed` keys in place.
+
+    Returns the draft's new version, or None if it doesn't exist or (when
+    `expected_version` is given) has been written since that version.
+    """
+    if conn is None:
+        with db_connection() as conn:
+            version = update_draft_fields(name, changed, removed, conn, expected_version)
+        if version is not None:
+            invalidate_draft(name, membership=False)
+            schedule_thumbnail(name)
+        return version
     c = conn.cursor()
-    c.execute("SELECT content FROM drafts WHERE name = %s", (name,))
-    row = c.fetchone()
-    conn.close()
+    with timed(DB_SECONDS, op="update_fields"):
+        c.execute(*update_fields_query(name, changed, removed, expected_version))
+        row = c.fetchone()
+    return row[0] if row else None
+
+def load_draft_with_version(name, cached=True):
+    """Return (content, version) for a draft, or ({}, 0) if it doesn't exist."""
+    if cached and draft_cache_active():
+        return draft_cache.get_draft(name, lambda: select_draft(name))
+    return select_draft(name)
+
+@timed(DB_SECONDS, op="load")
+def select_draft(name):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(SELECT_DRAFT_SQL, (name,))
+        row = c.fetchone()
     if row:
-        return json.loads(row[0])
-    return {}
+        return row[0], row[1]
+    return {}, 0
 
-def list_drafts():
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("SELECT name FROM drafts")
-    drafts = [row[0] for row in c.fetchall()]
-    conn.close()
+def load_draft_from_db(name):
+    return load_draft_with_version(name)[0]
+
+def list_drafts(after=None, limit=None, search=None, fields=None):
+    """Draft names in name order, one keyset page at a time.
+
+    `after` is the last name of the previous page; `search` matches a
+    case-insensitive substring of the name; `fields` ({"Sponsor": "X"})
+    keeps drafts whose content has exactly those field values.
+    """
+    if draft_cache_active():
+        return draft_cache.get_list(draft_names_cache_key(after, limit, search, fields),
+                                    lambda: select_draft_names(after, limit, search, fields))
+    return select_draft_names(after, limit, search, fields)
+
+@timed(DB_SECONDS, op="list")
+def select_draft_names(after, limit, search, fields):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(*draft_names_query(after, limit, search, fields))
+        drafts = [row[0] for row in c.fetchall()]
     return drafts
 
-def delete_draft(name):
-    conn = get_db_connection()
+@timed(DB_SECONDS, op="revisions")
+def list_revisions(name, before=None, limit=REVISIONS_PAGE_SIZE):
+    """A draft's revisions, newest first, without their contents; see revisions.revision_summary."""
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(*list_revisions_query(name, before, limit))
+        return [revision_summary(row) for row in c.fetchall()]
+
+def load_revision(name, version, conn=None):
+    """Return a draft's content as of `version`, or None if there is no such revision."""
+    if conn is None:
+        with db_connection() as conn:
+            return load_revision(name, version, conn)
     c = conn.cursor()
-    c.execute("DELETE FROM drafts WHERE name = %s", (name,))
-    conn.commit()
-    conn.close()
-
-# --- PDF utilities ---
-def draw_wrapped_text(p, x, y, text, max_width, font_name=None, font_size=None, line_height=14):
-    if font_name and font_size:
-        p.setFont(font_name, font_size)
-    words = text.split()
-    lines = []
-    current_line = ""
-    for word in words:
-        test_line = current_line + " " + word if current_line else word
-        if p.stringWidth(test_line, font_name, font_size) <= max_width:
-            current_line = test_line
-        else:
-            lines.append(current_line)
-            current_line = word
-    if current_line:
-        lines.append(current_line)
-    for line in lines:
-        p.drawString(x, y, line)
-        y -= line_height
-    return len(lines) * line_height
-
-def get_text_height(text, max_width, font_name="Helvetica", font_size=10, line_height=14):
-    dummy = canvas.Canvas(io.BytesIO())
-    dummy.setFont(font_name, font_size)
-    words = text.split()
-    lines = []
-    current_line = ""
-    for word in words:
-        test_line = current_line + " " + word if current_line else word
-        if dummy.stringWidth(test_line, font_name, font_size) <= max_width:
-            current_line = test_line
-        else:
-            lines.append(current_line)
-            current_line = word
-    if current_line:
-        lines.append(current_line)
-    return line_height * len(lines) + 10
+    with timed(DB_SECONDS, op="load_revision"):
+        c.execute(*revision_chain_query(name, version))
+        return rebuild_revision(c.fetchall(), version)
+
+def restore_revision(name, version, expected_version=None):
+    """Make an old revision current again, recorded as a new revision.
+
+    Returns (new version, None), or (None, reason) where reason is "missing"
+    (no such revision) or "conflict" (written since `expected_version`).
+    """
+    with db_connection() as conn:
+        content = load_revision(name, version, conn)
+        if content is None:
+            return None, "missing"
+        c = conn.cursor()
+        c.execute(LOCK_DRAFT_SQL, (name,))
+        changed, removed = field_delta(c.fetchone()[0], content)
+        new_version = update_draft_fields(name, changed, removed, conn, expected_version)
+        if new_version is None:
+            return None, "conflict"
+    invalidate_draft(name, membership=False)
+    schedule_thumbnail(name)
+    return new_version, None
+
+@timed(DB_SECONDS, op="search")
+def search_drafts(q, limit, offset=0):
+    """Drafts whose content matches the web-search style query `q`, best first.
+
+    Returns a list of {"name", "rank", "snippet"}; see draftsearch.
+    """
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(*search_drafts_query(q, limit, offset))
+        return [search_result(row) for row in c.fetchall()]
+
+@timed(DB_SECONDS, op="delete")
+def delete_draft(name):
+    with db_connection() as conn:
+        c = conn.cursor()
+        c.execute(DELETE_DRAFT_SQL, (name,))
+    invalidate_draft(name)
+
+def import_drafts_to_db(drafts, mode="upsert", batch_size=1000, progress=None):
+    """Bulk-write (name, content dict) pairs, `batch_size` per transaction; returns an ImportResult."""
+    return import_drafts(db_connection, drafts, mode, batch_size, progress, on_batch=invalidate_drafts)
+
+def delete_drafts_from_db(names, batch_size=1000, progress=None):
+    """Bulk-delete drafts by name, `batch_size` per transaction; returns how many were deleted."""
+    return delete_drafts(db_connection, names, batch_size, progress, on_batch=invalidate_drafts)
+
+def invalidate_drafts(names):
+    for name in names:
+        invalidate_draft(name)
+
+# --- Instrumentation ---
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if PROFILE_ALL_REQUESTS or (PROFILE_REQUESTS and request.headers.get("X-Profile") == "1"):
+        g.profiler = SamplingProfiler().start()
+
+@app.after_request
+def record_request_timing(response):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        path = os.path.join(PROFILE_DIR, f"profile-{request.endpoint}-{time.time():.6f}.txt")
+        with open(path, "w") as f:
+            f.write(profiler.stop())
+        response.headers["X-Profile-File"] = path
+    started = g.pop("request_started", None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or "unknown",
+                                method=request.method, status=response.status_code)
+    return response
+
+# --- Compression and static files ---
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    if endpoint == "static" and "filename" in values:
+        values["filename"] = static_assets.url_filename(values["filename"])
+
+@app.after_request
+def compress_response(response):
+    if response.direct_passthrough or response.is_streamed or "Content-Encoding" in response.headers \
+            or not compressible(response.mimetype) or (response.content_length or 0) < COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    with timed(COMPRESS_SECONDS, encoding=encoding):
+        response.set_data(compress(response.get_data(), encoding))
+    response.content_encoding = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+@metrics.register_collector
+def collect_runtime_stats():
+    pool = db_pool.stats()
+    cache = pdf_cache.stats()
+    words = measure_cache_info()["word_widths"]
+    collected = [
+        ("db_pool_connections", "Pooled connections by state.", "gauge",
+         [({"state": "in_use"}, pool["in_use"]), ({"state": "idle"}, pool["idle"]),
+          ({"state": "max"}, pool["max_size"])]),
+        ("db_pool_checkouts_total", "Connections handed out by the pool.", "counter", [({}, pool["checkouts"])]),
+        ("db_pool_timeouts_total", "Checkouts that gave up waiting.", "counter", [({}, pool["timeouts"])]),
+        ("db_pool_wait_seconds_total", "Total time spent waiting for a connection.", "counter",
+         [({}, pool["wait_seconds_total"])]),
+        ("db_pool_wait_seconds_max", "Longest wait for a connection.", "gauge", [({}, pool["wait_seconds_max"])]),
+        ("pdf_cache_requests_total", "Render cache lookups by result.", "counter",
+         [({"result": "memory_hit"}, cache["memory_hits"]), ({"result": "disk_hit"}, cache["disk_hits"]),
+          ({"result": "miss"}, cache["misses"])]),
+        ("pdf_cache_evictions_total", "Render cache evictions.", "counter", [({}, cache["evictions"])]),
+        ("pdf_cache_memory_bytes", "Bytes held by the in-memory render cache.", "gauge", [({}, cache["memory_bytes"])]),
+        ("word_width_cache_requests_total", "Word-width cache lookups by result.", "counter",
+         [({"result": "hit"}, words.hits), ({"result": "miss"}, words.misses)]),
+    ]
+    if draft_cache is not None:
+        drafts = draft_cache.stats()
+        collected.extend([
+            ("draft_cache_requests_total", "Draft read cache lookups by result.", "counter",
+             [({"result": "hit"}, drafts["hits"]), ({"result": "miss"}, drafts["misses"])]),
+            ("draft_cache_invalidations_total", "Draft cache invalidations, by scope.", "counter",
+             [({"scope": "draft"}, drafts["invalidations"]), ({"scope": "all"}, drafts["resets"])]),
+            ("draft_cache_entries", "Entries held by the draft read cache.", "gauge",
+             [({"kind": "draft"}, drafts["drafts"]), ({"kind": "list"}, drafts["lists"])]),
+        ])
+        if draft_listener is not None:
+            collected.append(("draft_cache_listener_up", "Whether this worker is receiving draft change notifications.",
+                              "gauge", [({}, int(draft_listener.live))]))
+    if render_jobs is not None:
+        collected.append(("render_jobs_pending", "Render jobs queued or running in this worker.", "gauge",
+                          [({}, render_jobs.stats()["pending"])]))
+    if thumbnail_queue is not None:
+        collected.append(("thumbnail_renders_pending", "Draft thumbnails waiting to be rendered in this worker.",
+                          "gauge", [({}, thumbnail_queue.stats()["pending"])]))
+    return collected
 
 # --- Routes ---
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: the process is up and serving. Never touches the database."""
+    return jsonify(status="ok")
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: the database answers and the drafts schema is in place."""
+    try:
+        with db_connection() as conn:
+            content_type = content_column_type(conn)
+    except Exception as exc:
+        return jsonify(status="unavailable", error=str(exc)), 503
+    error = schema_error(content_type)
+    if error:
+        return jsonify(status="unavailable", error=error), 503
+    return jsonify(status="ok")
+
+@app.route('/static/<path:filename>', methods=['GET'], endpoint='static')
+def static_file(filename):
+    asset, immutable = static_assets.lookup(filename)
+    if asset is None:
+        abort(404)
+    encoding = negotiate_encoding(request.accept_encodings, asset.variants) if asset.variants else None
+    if encoding:
+        response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+        response.content_encoding = encoding
+        response.set_etag(f"{asset.digest}-{encoding}")
+        response.make_conditional(request)
+    else:
+        response = send_file(asset.path, mimetype=asset.mimetype, etag=asset.digest)
+    if asset.variants:
+        response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else f"public, max-age={STATIC_MAX_AGE}"
+    return response
+
 @app.route('/', methods=['GET'])
 def form():
     draft_name = request.args.get("draft")
-    data = load_draft_from_db(draft_name) if draft_name else {}
-    return render_template('form.html', data=data, drafts=list_drafts(), selected_draft=draft_name)
+    data, version = load_draft_with_version(draft_name) if draft_name else ({}, 0)
+    return render_template('form.html', data=data, selected_draft=draft_name, draft_version=version)
+
+def parse_autosave(payload):
+    """Validate an autosave body; returns (name, version, changed, removed) or None."""
+    payload = payload if isinstance(payload, dict) else {}
+    name = payload.get("name")
+    version = payload.get("version")
+    changed = payload.get("changed") or {}
+    removed = payload.get("removed") or []
+    if not name or not isinstance(name, str) or not isinstance(version, int) \
+            or not isinstance(changed, dict) or not isinstance(removed, list):
+        return None
+    # Field values are rendered as text; anything else would break every
+    # later render (and export) of the draft.
+    if not all(isinstance(k, str) and isinstance(v, str) for k, v in changed.items()) \
+            or not all(isinstance(k, str) for k in removed):
+        return None
+    changed = {k: v for k, v in changed.items() if k not in AUTOSAVE_IGNORED_FIELDS}
+    return name, version, changed, removed
+
+@app.route('/drafts/autosave', methods=['POST'])
+def autosave():
+    """Apply a field-level delta from the form page's debounced autosave.
+
+    Expects {"name", "version", "changed": {field: value}, "removed": [field]}
+    and answers with the new version, or 409 with the current version if the
+    draft was saved elsewhere in the meantime.
+    """
+    parsed = parse_autosave(request.get_json(silent=True))
+    if parsed is None:
+        return jsonify(error="name, version, changed ({field: text}) and removed ([field]) are required"), 400
+    name, version, changed, removed = parsed
+    if version == 0:
+        with db_connection() as conn:
+            c = conn.cursor()
+            c.execute(CREATE_DRAFT_SQL, (name, json.dumps(changed)))
+            row = c.fetchone()
+        new_version = row[0] if row else None
+        if new_version is not None:
+            invalidate_draft(name)
+            schedule_thumbnail(name)
+    elif not changed and not removed:
+        return jsonify(version=version)
+    else:
+        new_version = update_draft_fields(name, changed, removed, expected_version=version)
+    if new_version is None:
+        _, current = load_draft_with_version(name, cached=False)
+        return jsonify(error="Draft was changed elsewhere", version=current), 409
+    return jsonify(version=new_version)
+
+@app.route('/drafts', methods=['GET'])
+def drafts_page():
+    limit = page_limit(request.args, DRAFTS_PAGE_SIZE)
+    fields = dict(zip(request.args.getlist("field"), request.args.getlist("value")))
+    names = list_drafts(after=request.args.get("after"), limit=limit + 1, search=request.args.get("q"),
+                        fields=fields)
+    next_after = names[limit - 1] if len(names) > limit else None
+    return jsonify(drafts=names[:limit], next=next_after)
+
+@app.route('/drafts/thumbnail', methods=['GET'])
+def draft_thumbnail():
+    """First-page PNG of draft ?name=; 202 while it is still being rendered in the background."""
+    name = request.args.get("name")
+    if not name:
+        return jsonify(error="name is required"), 400
+    if thumbnail_queue is None:
+        return jsonify(error="Thumbnails are disabled"), 404
+    data, version = load_draft_with_version(name)
+    if not version:
+        return jsonify(error="No such draft"), 404
+    key = thumbnail_queue.key(data)
+    if request.if_none_match.contains_weak(key):
+        response = Response(status=304)
+    else:
+        png = thumbnail_cache.get(key)
+        if png is None:
+            thumbnail_queue.schedule(name)
+            response = jsonify(status="pending")
+            response.status_code = 202
+            response.headers["Retry-After"] = "2"
+            response.headers["Cache-Control"] = "no-store"
+            return response
+        response = Response(png, mimetype='image/png')
+    # Keyed by content: revalidating is a cached draft read and a hash.
+    response.set_etag(key)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route('/drafts/revisions', methods=['GET'])
+def drafts_revisions():
+    """Revision history of ?name=, newest first; page with `before` (the `next` of the previous page)."""
+    name = request.args.get("name")
+    if not name:
+        return jsonify(error="name is required"), 400
+    limit = page_limit(request.args, REVISIONS_PAGE_SIZE)
+    revisions = list_revisions(name, request.args.get("before", type=int), limit + 1)
+    next_before = revisions[limit - 1]["version"] if len(revisions) > limit else None
+    return jsonify(revisions=revisions[:limit], next=next_before)
+
+@app.route('/drafts/revisions/diff', methods=['GET'])
+def drafts_revisions_diff():
+    """Fields that differ between revisions ?from= and ?to= of draft ?name=."""
+    name = request.args.get("name")
+    old_version = request.args.get("from", type=int)
+    new_version = request.args.get("to", type=int)
+    if not name or old_version is None or new_version is None:
+        return jsonify(error="name, from and to are required"), 400
+    with db_connection() as conn:
+        old = load_revision(name, old_version, conn)
+        new = load_revision(name, new_version, conn)
+    if old is None or new is None:
+        return jsonify(error="No such revision"), 404
+    return jsonify(name=name, from_version=old_version, to_version=new_version, changes=diff_revisions(old, new))
+
+@app.route('/drafts/revisions/restore', methods=['POST'])
+def drafts_revisions_restore():
+    """Restore {"name", "version"}; with "expected_version", 409 if the draft was written since."""
+    payload = request.get_json(silent=True) or {}
+    name, version = payload.get("name"), payload.get("version")
+    expected_version = payload.get("expected_version")
+    if not isinstance(name, str) or not name or not isinstance(version, int) \
+            or not isinstance(expected_version, (int, type(None))):
+        return jsonify(error="name and version are required"), 400
+    new_version, error = restore_revision(name, version, expected_version)
+    if error == "missing":
+        return jsonify(error="No such revision"), 404
+    if error == "conflict":
+        _, current = load_draft_with_version(name, cached=False)
+        return jsonify(error="Draft was changed elsewhere", version=current), 409
+    return jsonify(version=new_version)
+
+@app.route('/drafts/search', methods=['GET'])
+def drafts_search():
+    """Ranked full-text search over draft contents; page with `offset` (the `next` of the previous page)."""
+    q = request.args.get("q", "").strip()
+    limit = page_limit(request.args, SEARCH_PAGE_SIZE)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    results = search_drafts(q, limit + 1, offset) if q else []
+    next_offset = offset + limit if len(results) > limit else None
+    return jsonify(results=results[:limit], next=next_offset)
 
 @app.route('/submit', methods=['POST'])
 def submit():
@@ -133,121 +712,162 @@ def submit():
         return redirect(url_for('form'))
 
     # --- PDF Generation ---
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    p.setFillColorRGB(0.15, 0.18, 0.25)
-    p.rect(0, height - 70, width, 70, fill=1, stroke=0)
-    p.setFillColor(colors.white)
-    p.setFont("Helvetica-Bold", 14)
-    p.drawString(50, height - 30, "Turning Point for God")
-    p.setFont("Helvetica-Bold", 16)
-    p.drawString(50, height - 50, "Strategic / Ad hoc Topic Summary")
-    logo_path = os.path.join("static", "overlay_icon.png")
-    if os.path.exists(logo_path):
-        p.drawImage(logo_path, width - 70, height - 60, width=40, height=40, mask='auto')
-
-    p.setFillColor(colors.black)
-    y = height - 90
-    top_fields = [
-        ("Topic", data.get("Topic", "")),
-        ("Point Person", data.get("PointPerson", "")),
-        ("Role of Executive Team (consult, inform, decide)", data.get("Role", "")),
-        ("Executive Sponsor", data.get("Sponsor", "")),
-        ("Problem Definition", data.get("Problem", "")),
-        ("Outcome Description", data.get("Outcome", "")),
-        ("Primary Recommendation", data.get("Recommendation", ""))
-    ]
-    for label, val in top_fields:
-        box_height = get_text_height(val, width - 100)
-        if y - box_height < 60:
-            p.showPage()
-            y = height - 50
-        p.setFont("Helvetica-Bold", 12)
-        p.drawString(50, y, label)
-        p.rect(50, y - box_height - 5, width - 100, box_height, stroke=1, fill=0)
-        p.setFont("Helvetica", 10)
-        draw_wrapped_text(p, 55, y - 20, val, width - 110)
-        y -= (box_height + 25)
-
-    p.showPage()
-    y = height - 90
-
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, "Options Table")
-    y -= 20
-
-    rows = [
-        ("Description", [data.get("Option1Description", ""), data.get("Option2Description", ""), data.get("Option3Description", "")]),
-        ("Pros", [data.get("Option1Pros", ""), data.get("Option2Pros", ""), data.get("Option3Pros", "")]),
-        ("Cons", [data.get("Option1Cons", ""), data.get("Option2Cons", ""), data.get("Option3Cons", "")]),
-        ("Benefits/Revenue", [data.get("Option1Benefits/Revenue", ""), data.get("Option2Benefits/Revenue", ""), data.get("Option3Benefits/Revenue", "")]),
-        ("Obstacles", [data.get("Option1Obstacles", ""), data.get("Option2Obstacles", ""), data.get("Option3Obstacles", "")])
-    ]
-    col_width = (width - 100) / 4
-    p.setFont("Helvetica-Bold", 11)
-    p.rect(50, y - 20, col_width, 20, stroke=1, fill=0)
-    for i, header in enumerate(["Option 1", "Option 2", "Option 3"]):
-        x = 50 + col_width * (i + 1)
-        p.rect(x, y - 20, col_width, 20, stroke=1, fill=0)
-        p.drawCentredString(x + col_width / 2, y - 15, header)
-    y -= 30
-
-    for label, options in rows:
-        heights = [get_text_height(txt, col_width - 10) for txt in options]
-        row_h = max(heights) + 20
-        if y - row_h < 60:
-            p.showPage()
-            y = height - 50
-        p.setFont("Helvetica-Bold", 10)
-        p.rect(50, y - row_h, col_width, row_h, stroke=1, fill=0)
-        draw_wrapped_text(p, 55, y - 20, label, col_width - 10, "Helvetica-Bold", 11)
-        for i in range(3):
-            x = 50 + (i + 1) * col_width
-            p.setFont("Helvetica", 10)
-            p.rect(x, y - row_h, col_width, row_h, stroke=1, fill=0)
-            draw_wrapped_text(p, x + 5, y - 20, options[i], col_width - 10)
-        y -= (row_h + 10)
-        y -= 8
-
-    decision = data.get("Decision", "")
-    box_height = get_text_height(decision, width - 100)
-    if y - box_height < 60:
-        p.showPage()
-        y = height - 50
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, "Final Decision")
-    p.rect(50, y - box_height - 5, width - 100, box_height, stroke=1, fill=0)
-    p.setFont("Helvetica", 10)
-    draw_wrapped_text(p, 55, y - 20, decision, width - 110)
-    y -= (box_height + 15)
-    y -= 20
-
-    p.setFont("Helvetica-Bold", 12)
-    p.drawString(50, y, "Key Actions: (Who, What, When?)")
-    y -= 10
-    for i in range(1, 6):
-        action = data.get(f"Action{i}", "")
-        box_height = get_text_height(action, width - 130)
-        if y - box_height < 60:
-            p.showPage()
-            y = height - 50
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(55, y - 15, f"{i}.")
-        p.rect(75, y - box_height - 5, width - 120, box_height, stroke=1, fill=0)
-        p.setFont("Helvetica", 10)
-        draw_wrapped_text(p, 80, y - 20, action, width - 130)
-        y -= (box_height + 15)
-
-    logo_path = os.path.join("static", "logo.png")
-    if os.path.exists(logo_path):
-        p.drawImage(logo_path, 50, 20, width=80, height=30, mask='auto')  # Adjust size/position as needed
-     
-
-    p.save()
-    buffer.seek(0)
+    profile = output_profile(request.args.get("profile"))
+    renderer = pdf_renderer(request.args.get("renderer"))
+    key = pdf_cache.content_key(data, render_variant(profile, renderer))
+    if request.if_none_match.contains_weak(key):
+        response = Response(status=304)
+        response.set_etag(key)
+        return response
     pdf_filename = f"{draft_name or 'Strategic_Topic_Summary'}.pdf"
-    return send_file(buffer, as_attachment=True, download_name=pdf_filename, mimetype='application/pdf')
+    pdf_bytes = pdf_cache.get(key)
+    if pdf_bytes is None and render_jobs is not None:
+        try:
+            job_id = render_jobs.submit(data, pdf_filename, profile, renderer)
+        except QueueFull:
+            response = jsonify(error="Too many PDFs are being generated. Please try again shortly.")
+            response.status_code = 429
+            response.headers["Retry-After"] = "5"
+            return response
+        except (BrokenProcessPool, OSError):
+            app.logger.exception("Render queue unavailable, rendering inline")
+        else:
+            response = jsonify(job_id=job_id, status_url=url_for('job_status', job_id=job_id),
+                               download_url=url_for('job_download', job_id=job_id))
+            response.status_code = 202
+            response.headers["Location"] = url_for('job_status', job_id=job_id)
+            return response
+    if pdf_bytes is not None:
+        return send_pdf(io.BytesIO(pdf_bytes), len(pdf_bytes), pdf_filename, key)
+
+    # Render into a spooled file: small PDFs stay in memory and are cached,
+    # large ones spill to disk and are streamed out in chunks from there.
+    spool = tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_BYTES)
+    write_pdf(data, spool, profile=profile, renderer=renderer)
+    size = spool.tell()
+    spool.seek(0)
+    if size <= PDF_SPOOL_BYTES:
+        pdf_cache.put(key, spool.read())
+        spool.seek(0)
+    return send_pdf(spool, size, pdf_filename, key)
+
+def output_profile(name):
+    """Validate a ?profile= value against OUTPUT_PROFILES; empty means the configured default."""
+    profile = name or OUTPUT_PROFILE
+    if profile not in OUTPUT_PROFILES:
+        abort(400, f"Unknown PDF profile {profile!r}; expected one of {', '.join(OUTPUT_PROFILES)}.")
+    return profile
+
+def pdf_renderer(name):
+    """Validate a ?renderer= value against RENDERERS; empty means the configured default."""
+    renderer = name or PDF_RENDERER
+    if renderer not in RENDERERS:
+        abort(400, f"Unknown PDF renderer {renderer!r}; expected one of {', '.join(RENDERERS)}.")
+    if renderer == "weasyprint" and not htmlrender.available():
+        abort(503, "The weasyprint renderer is not available on this server.")
+    return renderer
+
+@timed(SEND_SECONDS)
+def send_pdf(fileobj, size, filename, etag):
+    response = send_file(fileobj, as_attachment=True, download_name=filename,
+                         mimetype='application/pdf', etag=etag)
+    response.content_length = size
+    return response
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = render_jobs.status(job_id) if render_jobs else None
+    if job is None:
+        abort(404)
+    if job["status"] == "done":
+        job["download_url"] = url_for('job_download', job_id=job_id)
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/pdf', methods=['GET'])
+def job_download(job_id):
+    path = render_jobs.result_path(job_id) if render_jobs else None
+    if path is None:
+        abort(404)
+    job = render_jobs.status(job_id)
+    return send_file(path, as_attachment=True, download_name=job["filename"], mimetype='application/pdf')
+
+def export_drafts_zip(profile=None, renderer=None):
+    """Stream every saved draft, rendered to PDF, as ZIP archive chunks."""
+    with db_connection() as conn:
+        yield from stream_zip(render_many(iter_drafts(conn), EXPORT_WORKERS, profile, renderer))
+
+@app.route('/export.zip', methods=['GET'])
+def export_drafts():
+    profile = output_profile(request.args.get("profile"))
+    renderer = pdf_renderer(request.args.get("renderer"))
+    return Response(export_drafts_zip(profile, renderer), mimetype='application/zip',
+                    headers={"Content-Disposition": "attachment; filename=drafts.zip"})
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create the drafts table and its indexes (safe to run repeatedly)."""
+    init_db()
+    click.echo("Database initialized")
+
+@app.cli.command("migrate-jsonb")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows backfilled per transaction.")
+def migrate_jsonb_command(batch_size):
+    """Convert drafts.content from TEXT to JSONB in batches, without locking the table."""
+    migrated = migrate_content_to_jsonb(db_connection, batch_size,
+                                        progress=lambda n: click.echo(f"{n} drafts converted"))
+    click.echo(f"Done: {migrated} drafts converted")
+    # init_db() skips revision history and search indexing while content is
+    # TEXT; install them now rather than waiting for the next init-db.
+    init_db()
+    click.echo("Revision history and search indexing installed")
+
+@app.cli.command("rebuild-search")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows updated per transaction.")
+def rebuild_search_command(batch_size):
+    """Recompute the full-text search vectors, e.g. after changing draftsearch.SEARCH_WEIGHTS."""
+    install_search(db_connection)
+    updated = backfill_search_vector(db_connection, batch_size, rebuild=True,
+                                     progress=lambda n: click.echo(f"{n} drafts reindexed"))
+    click.echo(f"Done: {updated} drafts reindexed")
+
+@app.cli.command("import-drafts")
+@click.argument("input", type=click.File("r", encoding="utf-8"))
+@click.option("--mode", type=click.Choice(IMPORT_MODES), default="upsert", show_default=True,
+              help="'insert' skips drafts that already exist; 'upsert' replaces their content.")
+@click.option("--batch-size", default=1000, show_default=True, help="Drafts written per transaction.")
+def import_drafts_command(input, mode, batch_size):
+    """Import drafts from a JSON Lines file ("-" for stdin).
+
+    Each line is {"name": "...", "content": {"Topic": "...", ...}}.
+    """
+    try:
+        result = import_drafts_to_db(read_jsonl(input), mode, batch_size,
+                                     progress=lambda n: click.echo(f"{n} drafts processed"))
+    except ValueError as exc:
+        raise click.ClickException(f"{exc}; batches before it were committed")
+    click.echo(f"Done: {result.inserted} inserted, {result.updated} updated, {result.unchanged} unchanged")
+
+@app.cli.command("delete-drafts")
+@click.argument("input", type=click.File("r", encoding="utf-8"))
+@click.option("--batch-size", default=1000, show_default=True, help="Drafts deleted per transaction.")
+def delete_drafts_command(input, batch_size):
+    """Delete the drafts named in a file ("-" for stdin): one name per line, or JSON Lines records."""
+    deleted = delete_drafts_from_db(read_names(input), batch_size,
+                                    progress=lambda n: click.echo(f"{n} names processed"))
+    click.echo(f"Done: {deleted} drafts deleted")
+
+@app.cli.command("export-drafts")
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option("--profile", type=click.Choice(list(OUTPUT_PROFILES)), default=OUTPUT_PROFILE, show_default=True,
+              help="PDF output profile; 'compact' makes much smaller files for archiving.")
+@click.option("--renderer", type=click.Choice(list(RENDERERS)), default=PDF_RENDERER, show_default=True,
+              help="PDF backend.")
+def export_drafts_command(output, profile, renderer):
+    """Render every saved draft to PDF and write them into a ZIP file."""
+    with open(output, "wb") as f:
+        for chunk in export_drafts_zip(profile, renderer):
+            f.write(chunk)
+    click.echo(f"Wrote {output}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,642 @@
+"""Async (ASGI) serving mode: app.py's routes and templates on Quart.
+
+Draft reads and writes go through an async psycopg pool and PDFs are
+rendered on an executor, so one worker's event loop keeps serving other
+form sessions while a query or a render is in flight. SQL, caches, metrics
+and configuration are shared with app.py. Run it with any ASGI server:
+
+    uvicorn asgi:app --workers 4
+
+Renders use a thread pool (ASYNC_RENDER_THREADS); set
+ASYNC_RENDER_PROCESSES to render on worker processes instead, which keeps
+large PDFs from competing with the event loop for the GIL.
+"""
+import asyncio
+import functools
+import json
+import multiprocessing
+import os
+import threading
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import quote
+
+from psycopg_pool import AsyncConnectionPool
+from quart import Quart, Response, abort, flash, g, jsonify, redirect, render_template, request, send_file, url_for
+from quart.wrappers.response import DataBody
+
+import app as sync_app
+import metrics
+from app import (
+    COMPRESS_MIN_BYTES, COMPRESS_SECONDS, CREATE_DRAFT_SQL, DB_SECONDS, DELETE_DRAFT_SQL, DRAFTS_PAGE_SIZE,
+    LOCK_DRAFT_SQL, NO_DB_ENDPOINTS, PDF_SPOOL_BYTES, REQUEST_SECONDS, REVISIONS_PAGE_SIZE, SEARCH_PAGE_SIZE,
+    SELECT_DRAFT_SQL, SEND_SECONDS, STATIC_MAX_AGE, UPSERT_DRAFT_SQL, draft_names_cache_key, draft_names_query,
+    field_delta, invalidate_draft, output_profile, page_limit, parse_autosave, pdf_renderer, schedule_thumbnail,
+    schema_error, static_assets, thumbnail_cache, thumbnail_queue, update_fields_query,
+)
+from draftsearch import search_drafts_query, search_result
+from formschema import FORM, html_blocks
+from metrics import timed
+from migrations import CONTENT_TYPE_SQL
+from pdfrender import render_pdf, render_variant
+from renderjobs import QueueFull
+from revisions import (
+    diff_revisions, list_revisions_query, rebuild_revision, revision_chain_query, revision_summary,
+)
+from staticassets import IMMUTABLE_CACHE_CONTROL, compress, compressible, negotiate_encoding
+
+# Static files come from app.static_assets, as in the sync app.
+app = Quart(__name__, static_folder=None)
+app.secret_key = sync_app.app.secret_key
+app.jinja_env.globals.update(form_schema=FORM, html_blocks=html_blocks)
+
+# Async connections are cheap to hold while idle, so the pool can be larger
+# than the sync one; it is opened when the server starts.
+db_pool = AsyncConnectionPool(
+    os.environ.get("DATABASE_URL") or "",
+    min_size=int(os.environ.get("ASYNC_DB_POOL_MIN", 1)),
+    max_size=int(os.environ.get("ASYNC_DB_POOL_MAX", 20)),
+    timeout=float(os.environ.get("DB_POOL_TIMEOUT", 10)),
+    check=AsyncConnectionPool.check_connection,
+    open=False,
+)
+RENDER_PROCESSES = int(os.environ.get("ASYNC_RENDER_PROCESSES", 0))
+RENDER_THREADS = int(os.environ.get("ASYNC_RENDER_THREADS", 4))
+# /export.zip streams for as long as the export takes; Quart's
+# RESPONSE_TIMEOUT (60s) would cut it off. Unset means no limit.
+EXPORT_TIMEOUT = float(os.environ["ASYNC_EXPORT_TIMEOUT"]) if os.environ.get("ASYNC_EXPORT_TIMEOUT") else None
+render_executor = None
+_db_initialized = False
+_db_init_lock = asyncio.Lock()
+
+
+def make_render_executor():
+    if RENDER_PROCESSES:
+        return ProcessPoolExecutor(RENDER_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return ThreadPoolExecutor(RENDER_THREADS, thread_name_prefix="render")
+
+
+@app.before_serving
+async def open_resources():
+    global render_executor
+    render_executor = make_render_executor()
+    await db_pool.open()
+
+
+@app.after_serving
+async def close_resources():
+    await db_pool.close()
+    render_executor.shutdown(wait=False, cancel_futures=True)
+
+
+@app.before_request
+async def lazy_init_db():
+    global _db_initialized
+    if _db_initialized or not sync_app.AUTO_INIT_DB or request.endpoint in NO_DB_ENDPOINTS:
+        return
+    async with _db_init_lock:
+        if not _db_initialized:
+            await asyncio.to_thread(sync_app.init_db)
+            _db_initialized = True
+
+
+_schema_ready = False
+
+
+@app.before_request
+async def require_jsonb_content():
+    """Same check as app.require_jsonb_content."""
+    global _schema_ready
+    if _schema_ready or request.endpoint in NO_DB_ENDPOINTS:
+        return
+    async with db_pool.connection() as conn:
+        cur = await conn.execute(CONTENT_TYPE_SQL)
+        row = await cur.fetchone()
+    error = schema_error(row[0] if row else None)
+    if error:
+        abort(503, error)
+    _schema_ready = True
+
+
+# --- Helper functions for DB ---
+async def save_draft_to_db(name, content_dict):
+    """Save a draft, writing only the fields that differ from the stored copy."""
+    with timed(DB_SECONDS, op="save"):
+        async with db_pool.connection() as conn:
+            cur = await conn.execute(LOCK_DRAFT_SQL, (name,))
+            row = await cur.fetchone()
+            if row is None:
+                await conn.execute(UPSERT_DRAFT_SQL, (name, json.dumps(content_dict)))
+            else:
+                changed, removed = field_delta(row[0], content_dict)
+                if not changed and not removed:
+                    return
+                await conn.execute(*update_fields_query(name, changed, removed))
+    invalidate_draft(name, membership=row is None)
+    schedule_thumbnail(name)
+
+
+async def create_draft(name, content_dict):
+    """Insert a new draft; returns its version, or None if the name is taken."""
+    with timed(DB_SECONDS, op="create"):
+        async with db_pool.connection() as conn:
+            cur = await conn.execute(CREATE_DRAFT_SQL, (name, json.dumps(content_dict)))
+            row = await cur.fetchone()
+    if row is None:
+        return None
+    invalidate_draft(name)
+    schedule_thumbnail(name)
+    return row[0]
+
+
+async def update_draft_fields(name, changed, removed=(), expected_version=None):
+    with timed(DB_SECONDS, op="update_fields"):
+        async with db_pool.connection() as conn:
+            cur = await conn.execute(*update_fields_query(name, changed, removed, expected_version))
+            row = await cur.fetchone()
+    if row is None:
+        return None
+    invalidate_draft(name, membership=False)
+    schedule_thumbnail(name)
+    return row[0]
+
+
+async def load_draft_with_version(name, cached=True):
+    """Return (content, version) for a draft, or ({}, 0) if it doesn't exist."""
+    if cached and sync_app.draft_cache_active():
+        return await sync_app.draft_cache.get_draft_async(name, lambda: select_draft(name))
+    return await select_draft(name)
+
+
+async def select_draft(name):
+    with timed(DB_SECONDS, op="load"):
+        async with db_pool.connection() as conn:
+            cur = await conn.execute(SELECT_DRAFT_SQL, (name,))
+            row = await cur.fetchone()
+    if row:
+        return row[0], row[1]
+    return {}, 0
+
+
+async def list_drafts(after=None, limit=None, search=None, fields=None):
+    if sync_app.draft_cache_active():
+        return await sync_app.draft_cache.get_list_async(draft_names_cache_key(after, limit, search, fields),
+                                                         lambda: select_draft_names(after, limit, search, fields))
+    return await select_draft_names(after, limit, search, fields)
+
+
+async def select_draft_names(after, limit, search, fields):
+    with timed(DB_SECONDS, op="list"):
+        async with db_pool.connection() as conn:
+            cur = await conn.execute(*draft_names_query(after, limit, search, fields))
+            rows = await cur.fetchall()
+    return [row[0] for row in rows]
+
+
+async def list_revisions(name, before=None, limit=REVISIONS_PAGE_SIZE):
+    with timed(DB_SECONDS, op="revisions"):
+        async with db_pool.connection() as conn:
+            cur = await conn.execute(*list_revisions_query(name, before, limit))
+            rows = await cur.fetchall()
+    return [revision_summary(row) for row in rows]
+
+
+async def load_revision(conn, name, version):
+    with timed(DB_SECONDS, op="load_revision"):
+        cur = await conn.execute(*revision_chain_query(name, version))
+        return rebuild_revision(await cur.fetchall(), version)
+
+
+async def restore_revision(name, version, expected_version=None):
+    """Same contract as app.restore_revision."""
+    async with db_pool.connection() as conn:
+        content = await load_revision(conn, name, version)
+        if content is None:
+            return None, "missing"
+        cur = await conn.execute(LOCK_DRAFT_SQL, (name,))
+        changed, removed = field_delta((await cur.fetchone())[0], content)
+        cur = await conn.execute(*update_fields_query(name, changed, removed, expected_version))
+        row = await cur.fetchone()
+        if row is None:
+            return None, "conflict"
+    invalidate_draft(name, membership=False)
+    schedule_thumbnail(name)
+    return row[0], None
+
+
+async def search_drafts(q, limit, offset=0):
+    with timed(DB_SECONDS, op="search"):
+        async with db_pool.connection() as conn:
+            cur = await conn.execute(*search_drafts_query(q, limit, offset))
+            rows = await cur.fetchall()
+    return [search_result(row) for row in rows]
+
+
+async def delete_draft(name):
+    with timed(DB_SECONDS, op="delete"):
+        async with db_pool.connection() as conn:
+            await conn.execute(DELETE_DRAFT_SQL, (name,))
+    invalidate_draft(name)
+
+
+# --- Rendering ---
+async def render_in_executor(data, profile=None, renderer=None):
+    global render_executor
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(render_executor,
+                                          functools.partial(render_pdf, data, profile=profile, renderer=renderer))
+    except BrokenProcessPool:
+        # A render process died; start a fresh pool for the next request.
+        render_executor = make_render_executor()
+        raise
+
+
+async def pdf_cache_call(method, *args):
+    # `method` is bound to a PDFCache (PDFs or thumbnails). The disk tier
+    # does file I/O; the memory tier is only a dict lookup.
+    if method.__self__.disk_dir:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+async def iterate_in_thread(make_iterator, max_buffered=4):
+    """Run a blocking iterator on a thread of its own and yield its items.
+
+    The same thread advances and closes the iterator, so closing never races
+    a next() in progress. If the consumer stops early (a client disconnect),
+    the thread stops after the item it is producing and closes the
+    iterator, releasing whatever it holds. At most `max_buffered` items wait.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    slots = threading.Semaphore(max_buffered)
+    stop = threading.Event()
+    done = object()
+
+    def post(item):
+        if not stop.is_set():
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def produce():
+        try:
+            it = make_iterator()
+            try:
+                for item in it:
+                    while not slots.acquire(timeout=0.5):
+                        if stop.is_set():
+                            return
+                    if stop.is_set():
+                        return
+                    post((item, None))
+            finally:
+                close = getattr(it, "close", None)
+                if close is not None:
+                    close()
+            post((done, None))
+        except BaseException as exc:
+            post((None, exc))
+
+    threading.Thread(target=produce, name="iterate-in-thread", daemon=True).start()
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            slots.release()
+            yield item
+    finally:
+        stop.set()
+
+
+def attachment(filename):
+    """Content-Disposition value for a download, as Flask's send_file builds it."""
+    try:
+        filename.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", filename).encode("ascii", "ignore").decode("ascii")
+        return f"attachment; filename=\"{simple}\"; filename*=UTF-8''{quote(filename, safe='!#$&+-.^_`|~')}"
+    return f"attachment; filename=\"{filename}\""
+
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@timed(SEND_SECONDS)
+def send_pdf(pdf_bytes, filename, etag=None):
+    response = Response(pdf_bytes, mimetype='application/pdf', headers={"Content-Disposition": attachment(filename)})
+    if etag:
+        response.set_etag(etag)
+    return response
+
+
+# --- Instrumentation ---
+@app.before_request
+async def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+async def record_request_timing(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint or "unknown",
+                                method=request.method, status=response.status_code)
+    return response
+
+
+# --- Compression and static files ---
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    if endpoint == "static" and "filename" in values:
+        values["filename"] = static_assets.url_filename(values["filename"])
+
+
+@app.after_request
+async def compress_response(response):
+    """Same policy as app.compress_response; file and streamed bodies are left alone."""
+    if not isinstance(response.response, DataBody) or "Content-Encoding" in response.headers \
+            or not compressible(response.mimetype) or (response.content_length or 0) < COMPRESS_MIN_BYTES:
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+    data = await response.get_data()
+    with timed(COMPRESS_SECONDS, encoding=encoding):
+        response.set_data(compress(data, encoding))
+    response.content_encoding = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@metrics.register_collector
+def collect_async_pool_stats():
+    stats = db_pool.get_stats()
+    return [
+        ("async_db_pool_connections", "Async pool connections by state.", "gauge",
+         [({"state": "open"}, stats.get("pool_size", 0)), ({"state": "idle"}, stats.get("pool_available", 0)),
+          ({"state": "max"}, stats.get("pool_max", 0))]),
+        ("async_db_pool_waiting", "Requests waiting for an async pool connection.", "gauge",
+         [({}, stats.get("requests_waiting", 0))]),
+    ]
+
+
+# --- Routes ---
+@app.route('/metrics', methods=['GET'])
+async def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/healthz', methods=['GET'])
+async def healthz():
+    """Liveness: the process is up and serving. Never touches the database."""
+    return jsonify(status="ok")
+
+
+@app.route('/readyz', methods=['GET'])
+async def readyz():
+    """Readiness: the database answers and the drafts schema is in place."""
+    try:
+        async with db_pool.connection() as conn:
+            cur = await conn.execute(CONTENT_TYPE_SQL)
+            row = await cur.fetchone()
+    except Exception as exc:
+        return jsonify(status="unavailable", error=str(exc)), 503
+    error = schema_error(row[0] if row else None)
+    if error:
+        return jsonify(status="unavailable", error=error), 503
+    return jsonify(status="ok")
+
+
+@app.route('/static/<path:filename>', methods=['GET'], endpoint='static')
+async def static_file(filename):
+    asset, immutable = static_assets.lookup(filename)
+    if asset is None:
+        abort(404)
+    encoding = negotiate_encoding(request.accept_encodings, asset.variants) if asset.variants else None
+    if encoding:
+        response = Response(asset.variants[encoding], mimetype=asset.mimetype)
+        response.content_encoding = encoding
+        response.set_etag(f"{asset.digest}-{encoding}")
+    else:
+        response = await send_file(asset.path, mimetype=asset.mimetype, add_etags=False)
+        response.set_etag(asset.digest)
+    await response.make_conditional(request)
+    if asset.variants:
+        response.vary.add("Accept-Encoding")
+    response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else f"public, max-age={STATIC_MAX_AGE}"
+    return response
+
+
+@app.route('/', methods=['GET'])
+async def form():
+    draft_name = request.args.get("draft")
+    data, version = await load_draft_with_version(draft_name) if draft_name else ({}, 0)
+    return await render_template('form.html', data=data, selected_draft=draft_name, draft_version=version)
+
+
+@app.route('/drafts/autosave', methods=['POST'])
+async def autosave():
+    """Same contract as app.autosave."""
+    parsed = parse_autosave(await request.get_json(silent=True))
+    if parsed is None:
+        return jsonify(error="name, version, changed ({field: text}) and removed ([field]) are required"), 400
+    name, version, changed, removed = parsed
+    if version == 0:
+        new_version = await create_draft(name, changed)
+    elif not changed and not removed:
+        return jsonify(version=version)
+    else:
+        new_version = await update_draft_fields(name, changed, removed, expected_version=version)
+    if new_version is None:
+        _, current = await load_draft_with_version(name, cached=False)
+        return jsonify(error="Draft was changed elsewhere", version=current), 409
+    return jsonify(version=new_version)
+
+
+@app.route('/drafts', methods=['GET'])
+async def drafts_page():
+    limit = page_limit(request.args, DRAFTS_PAGE_SIZE)
+    fields = dict(zip(request.args.getlist("field"), request.args.getlist("value")))
+    names = await list_drafts(after=request.args.get("after"), limit=limit + 1, search=request.args.get("q"),
+                              fields=fields)
+    next_after = names[limit - 1] if len(names) > limit else None
+    return jsonify(drafts=names[:limit], next=next_after)
+
+
+@app.route('/drafts/thumbnail', methods=['GET'])
+async def draft_thumbnail():
+    """Same contract as app.draft_thumbnail."""
+    name = request.args.get("name")
+    if not name:
+        return jsonify(error="name is required"), 400
+    if thumbnail_queue is None:
+        return jsonify(error="Thumbnails are disabled"), 404
+    data, version = await load_draft_with_version(name)
+    if not version:
+        return jsonify(error="No such draft"), 404
+    key = thumbnail_queue.key(data)
+    if request.if_none_match.contains_weak(key):
+        response = Response("", status=304)
+    else:
+        png = await pdf_cache_call(thumbnail_cache.get, key)
+        if png is None:
+            thumbnail_queue.schedule(name)
+            response = jsonify(status="pending")
+            response.status_code = 202
+            response.headers["Retry-After"] = "2"
+            response.headers["Cache-Control"] = "no-store"
+            return response
+        response = Response(png, mimetype='image/png')
+    response.set_etag(key)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+@app.route('/drafts/revisions', methods=['GET'])
+async def drafts_revisions():
+    name = request.args.get("name")
+    if not name:
+        return jsonify(error="name is required"), 400
+    limit = page_limit(request.args, REVISIONS_PAGE_SIZE)
+    revisions = await list_revisions(name, request.args.get("before", type=int), limit + 1)
+    next_before = revisions[limit - 1]["version"] if len(revisions) > limit else None
+    return jsonify(revisions=revisions[:limit], next=next_before)
+
+
+@app.route('/drafts/revisions/diff', methods=['GET'])
+async def drafts_revisions_diff():
+    name = request.args.get("name")
+    old_version = request.args.get("from", type=int)
+    new_version = request.args.get("to", type=int)
+    if not name or old_version is None or new_version is None:
+        return jsonify(error="name, from and to are required"), 400
+    async with db_pool.connection() as conn:
+        old = await load_revision(conn, name, old_version)
+        new = await load_revision(conn, name, new_version)
+    if old is None or new is None:
+        return jsonify(error="No such revision"), 404
+    return jsonify(name=name, from_version=old_version, to_version=new_version, changes=diff_revisions(old, new))
+
+
+@app.route('/drafts/revisions/restore', methods=['POST'])
+async def drafts_revisions_restore():
+    payload = await request.get_json(silent=True) or {}
+    name, version = payload.get("name"), payload.get("version")
+    expected_version = payload.get("expected_version")
+    if not isinstance(name, str) or not name or not isinstance(version, int) \
+            or not isinstance(expected_version, (int, type(None))):
+        return jsonify(error="name and version are required"), 400
+    new_version, error = await restore_revision(name, version, expected_version)
+    if error == "missing":
+        return jsonify(error="No such revision"), 404
+    if error == "conflict":
+        _, current = await load_draft_with_version(name, cached=False)
+        return jsonify(error="Draft was changed elsewhere", version=current), 409
+    return jsonify(version=new_version)
+
+
+@app.route('/drafts/search', methods=['GET'])
+async def drafts_search():
+    q = request.args.get("q", "").strip()
+    limit = page_limit(request.args, SEARCH_PAGE_SIZE)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    results = await search_drafts(q, limit + 1, offset) if q else []
+    next_offset = offset + limit if len(results) > limit else None
+    return jsonify(results=results[:limit], next=next_offset)
+
+
+@app.route('/submit', methods=['POST'])
+async def submit():
+    data = (await request.form).to_dict()
+    action = data.get("action")
+    draft_name = data.get("draft_name")
+
+    if action == "save":
+        if not draft_name:
+            await flash("Please enter a name for your draft.")
+        else:
+            await save_draft_to_db(draft_name, data)
+            await flash(f"Draft '{draft_name}' saved successfully.")
+        return redirect(url_for('form', draft=draft_name))
+
+    if action == "delete":
+        if draft_name:
+            await delete_draft(draft_name)
+            await flash(f"Draft '{draft_name}' has been deleted.")
+        return redirect(url_for('form'))
+
+    # --- PDF Generation ---
+    pdf_cache = sync_app.pdf_cache
+    render_jobs = sync_app.render_jobs
+    profile = output_profile(request.args.get("profile"))
+    renderer = pdf_renderer(request.args.get("renderer"))
+    key = pdf_cache.content_key(data, render_variant(profile, renderer))
+    if request.if_none_match.contains_weak(key):
+        response = Response("", status=304)
+        response.set_etag(key)
+        return response
+    pdf_filename = f"{draft_name or 'Strategic_Topic_Summary'}.pdf"
+    pdf_bytes = await pdf_cache_call(pdf_cache.get, key)
+    if pdf_bytes is None and render_jobs is not None:
+        try:
+            job_id = await asyncio.to_thread(render_jobs.submit, data, pdf_filename, profile, renderer)
+        except QueueFull:
+            response = jsonify(error="Too many PDFs are being generated. Please try again shortly.")
+            response.status_code = 429
+            response.headers["Retry-After"] = "5"
+            return response
+        except (BrokenProcessPool, OSError):
+            app.logger.exception("Render queue unavailable, rendering inline")
+        else:
+            response = jsonify(job_id=job_id, status_url=url_for('job_status', job_id=job_id),
+                               download_url=url_for('job_download', job_id=job_id))
+            response.status_code = 202
+            response.headers["Location"] = url_for('job_status', job_id=job_id)
+            return response
+    if pdf_bytes is None:
+        pdf_bytes = await render_in_executor(data, profile, renderer)
+        if len(pdf_bytes) <= PDF_SPOOL_BYTES:
+            await pdf_cache_call(pdf_cache.put, key, pdf_bytes)
+    return send_pdf(pdf_bytes, pdf_filename, key)
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+async def job_status(job_id):
+    render_jobs = sync_app.render_jobs
+    job = await asyncio.to_thread(render_jobs.status, job_id) if render_jobs else None
+    if job is None:
+        abort(404)
+    if job["status"] == "done":
+        job["download_url"] = url_for('job_download', job_id=job_id)
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>/pdf', methods=['GET'])
+async def job_download(job_id):
+    render_jobs = sync_app.render_jobs
+    path = render_jobs.result_path(job_id) if render_jobs else None
+    if path is None:
+        abort(404)
+    job = await asyncio.to_thread(render_jobs.status, job_id)
+    return send_pdf(await asyncio.to_thread(read_file, path), job["filename"])
+
+
+@app.route('/export.zip', methods=['GET'])
+async def export_drafts():
+    profile = output_profile(request.args.get("profile"))
+    renderer = pdf_renderer(request.args.get("renderer"))
+    # The export pipeline (server-side cursor, render pool, zipfile) is synchronous.
+    response = Response(iterate_in_thread(lambda: sync_app.export_drafts_zip(profile, renderer)),
+                        mimetype='application/zip', headers={"Content-Disposition": "attachment; filename=drafts.zip"})
+    response.timeout = EXPORT_TIMEOUT
+    return response
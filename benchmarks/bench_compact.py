@@ -0,0 +1,27 @@
+"""Compare PDF size and render time of the standard and compact output profiles.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_compact
+"""
+import timeit
+
+from benchmarks.drafts import DRAFT_PROFILES, QUICK_PROFILES
+from pdfrender import OUTPUT_PROFILES, render_pdf
+
+
+def main():
+    for profile in OUTPUT_PROFILES:
+        render_pdf({}, profile=profile)  # warm the image caches for each variant
+    for name in QUICK_PROFILES:
+        data = DRAFT_PROFILES[name]()
+        sizes = {}
+        for profile in OUTPUT_PROFILES:
+            seconds = min(timeit.repeat(lambda: render_pdf(data, profile=profile), number=5, repeat=3)) / 5
+            sizes[profile] = len(render_pdf(data, profile=profile))
+            ratio = sizes[profile] / sizes["standard"]
+            print(f"{name:<13} {profile:<9} {seconds * 1000:8.2f} ms  {sizes[profile]:>9} bytes  {ratio:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Compare text-height measurement against the original canvas-based version.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_measure
+"""
+import io
+import timeit
+
+from reportlab.pdfgen import canvas
+
+from benchmarks.drafts import sample_text
+from textlayout import layout_text, measure_cache_info
+
+
+def legacy_get_text_height(text, max_width, font_name="Helvetica", font_size=10, line_height=14):
+    dummy = canvas.Canvas(io.BytesIO())
+    dummy.setFont(font_name, font_size)
+    words = text.split()
+    lines = []
+    current_line = ""
+    for word in words:
+        test_line = current_line + " " + word if current_line else word
+        if dummy.stringWidth(test_line, font_name, font_size) <= max_width:
+            current_line = test_line
+        else:
+            lines.append(current_line)
+            current_line = word
+    if current_line:
+        lines.append(current_line)
+    return line_height * len(lines) + 10
+
+
+def get_text_height(text, max_width, font_name="Helvetica", font_size=10, line_height=14):
+    return layout_text(text, max_width, font_name, font_size, line_height).height + 10
+
+
+def main():
+    for n_words in (10, 100, 1000, 5000):
+        text = sample_text(n_words)
+        assert legacy_get_text_height(text, 502) == get_text_height(text, 502)
+        number = max(1, 2000 // n_words)
+        legacy = min(timeit.repeat(lambda: legacy_get_text_height(text, 502), number=number, repeat=5)) / number
+        new = min(timeit.repeat(lambda: get_text_height(text, 502), number=number, repeat=5)) / number
+        print(f"{n_words:>5} words  legacy {legacy * 1e6:10.1f} us  new {new * 1e6:10.1f} us  speedup {legacy / new:6.1f}x")
+    print(measure_cache_info()["word_widths"])
+
+
+if __name__ == "__main__":
+    main()
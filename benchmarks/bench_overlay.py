@@ -0,0 +1,25 @@
+"""Compare full redraw against the static-template overlay render mode.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_overlay
+"""
+import timeit
+
+from benchmarks.drafts import sample_draft
+from pdfrender import render_pdf
+
+
+def main():
+    for mode in ("redraw", "overlay"):
+        render_pdf({}, mode)  # warm image and template caches
+    for n_words in (0, 100, 1000):
+        data = sample_draft(n_words)
+        for mode in ("redraw", "overlay"):
+            seconds = min(timeit.repeat(lambda: render_pdf(data, mode), number=10, repeat=3)) / 10
+            size = len(render_pdf(data, mode))
+            print(f"{n_words:>5} words  {mode:<8} {seconds * 1000:8.2f} ms  {size:>9} bytes")
+
+
+if __name__ == "__main__":
+    main()
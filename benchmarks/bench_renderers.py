@@ -0,0 +1,85 @@
+"""Head-to-head comparison of the PDF backends: latency, memory and output size.
+
+Every (renderer, draft size) pair runs in a fresh process, so peak memory
+is measured in isolation. Run from the repository root:
+
+    python -m benchmarks.bench_renderers [--repeat N] [--output results.json]
+
+Renderers that can't load here (WeasyPrint without Pango) are reported as
+skipped.
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.drafts import DRAFT_PROFILES
+from benchmarks.suite import summarize, time_calls
+
+# Report name -> draft profile.
+SIZES = {"small": "short", "medium": "typical", "huge": "very_large"}
+
+
+def measure(renderer, profile, repeat):
+    """Runs in a fresh process: time `repeat` renders and report memory high-water marks."""
+    from pdfrender import render_pdf
+
+    data = DRAFT_PROFILES[profile]()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    try:
+        pdf = render_pdf(data, renderer=renderer)
+    except RuntimeError as exc:
+        return {"skipped": str(exc)}
+    first = time.perf_counter() - started
+    samples = time_calls(lambda: render_pdf(data, renderer=renderer), repeat)
+    # Traced separately: tracemalloc slows allocation-heavy code several-fold.
+    tracemalloc.start()
+    render_pdf(data, renderer=renderer)
+    python_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return dict(
+        summarize(samples),
+        first_render_ms=round(first * 1000, 4),
+        pdf_bytes=len(pdf),
+        # ru_maxrss is in KiB on Linux.
+        peak_rss_growth_mb=round((rss_after - rss_before) / 1024, 2),
+        python_peak_mb=round(python_peak / 2 ** 20, 2),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="timed renders per renderer and size")
+    parser.add_argument("--renderers", default="reportlab,weasyprint", help="comma-separated backends")
+    parser.add_argument("--output", "-o", help="also write the results as JSON here")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'renderer':<11} {'size':<7} {'median ms':>10} {'p95 ms':>10} {'first ms':>10} "
+          f"{'bytes':>10} {'rss +MB':>8} {'py MB':>7}")
+    for renderer in args.renderers.split(","):
+        for size, profile in SIZES.items():
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(measure, renderer, profile, args.repeat).result()
+            results.setdefault(renderer, {})[size] = result
+            if "skipped" in result:
+                print(f"{renderer:<11} {size:<7} skipped: {result['skipped']}", file=sys.stderr)
+                continue
+            print(f"{renderer:<11} {size:<7} {result['median_ms']:10.2f} {result['p95_ms']:10.2f} "
+                  f"{result['first_render_ms']:10.2f} {result['pdf_bytes']:>10} "
+                  f"{result['peak_rss_growth_mb']:8.1f} {result['python_peak_mb']:7.1f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
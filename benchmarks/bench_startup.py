@@ -0,0 +1,44 @@
+"""Measure cold-start cost: importing app.py and serving the first request.
+
+Each run is a fresh interpreter, so module import, template compilation and
+(with AUTO_INIT_DB on) lazy database initialisation are all included. Run
+from the repository root:
+
+    python -m benchmarks.bench_startup [--path /healthz] [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get(sys.argv[1])
+served = time.perf_counter()
+print(json.dumps({"import": imported - started, "first_request": served - imported,
+                  "status": response.status_code}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default="/healthz", help="URL of the first request")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", PROBE, args.path], capture_output=True, text=True, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    for phase in ("import", "first_request"):
+        values = [r[phase] * 1000 for r in results]
+        print(f"{phase:<14} median {statistics.median(values):8.1f} ms  max {max(values):8.1f} ms")
+    print(f"status         {sorted({r['status'] for r in results})}")
+
+
+if __name__ == "__main__":
+    main()
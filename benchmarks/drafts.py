@@ -0,0 +1,87 @@
+"""Deterministic synthetic drafts shared by the benchmarks and tests.
+
+Generators are seeded, so two runs (or two machines) benchmark
+byte-identical input.
+"""
+import random
+
+from formschema import FORM, FieldBoxes, FormSchema, NumberedBoxes, OptionsTable
+
+WORDS = ("strategy ministry outreach budget volunteers quarterly partnership "
+         "campus broadcast digital the a of and to in for with on by").split()
+
+# Deliberately wider than any box on the form, to exercise overlong-word wrapping.
+LONG_WORD = "supercalifragilisticexpialidocious" * 4
+
+
+def sample_text(n_words, seed=0):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def sample_draft(n_words, seed=0, option_words=None):
+    """A fully populated FORM draft with roughly `n_words` in each long field.
+
+    Option table cells and key actions get a tenth of that unless
+    `option_words` is given.
+    """
+    rng = random.Random(seed)
+
+    def text(n):
+        return " ".join(rng.choice(WORDS) for _ in range(n))
+
+    if option_words is None:
+        option_words = n_words // 10
+    data = {"Topic": text(6), "PointPerson": text(2), "Role": "decide", "Sponsor": text(2),
+            "Problem": text(n_words), "Outcome": text(n_words), "Recommendation": text(n_words // 4),
+            "Decision": text(n_words // 4)}
+    for col in (1, 2, 3):
+        for row in ("Description", "Pros", "Cons", "Benefits/Revenue", "Obstacles"):
+            data[f"Option{col}{row}"] = text(option_words)
+    for i in range(1, 6):
+        data[f"Action{i}"] = text(option_words)
+    return data
+
+
+# name -> draft; ordered from cheapest to most expensive to render.
+DRAFT_PROFILES = {
+    "empty": lambda: {},
+    "short": lambda: sample_draft(20),
+    "typical": lambda: sample_draft(300),
+    "long_words": lambda: dict(sample_draft(50), Problem=" ".join([LONG_WORD] * 20)),
+    "option_heavy": lambda: sample_draft(50, option_words=400),
+    "large": lambda: sample_draft(3000),
+    "very_large": lambda: sample_draft(20000),
+}
+
+QUICK_PROFILES = ("empty", "short", "typical", "long_words", "option_heavy", "large")
+
+
+def wide_options_schema(n_rows):
+    """FORM with an options table of `n_rows` rows, for layouts the web form can't produce."""
+    table = OptionsTable(
+        title="Options Table",
+        columns=["Option 1", "Option 2", "Option 3"],
+        rows=[f"Row {i}" for i in range(1, n_rows + 1)],
+        key_format="Option{col}{row}",
+    )
+    sections = [table if isinstance(section, OptionsTable) else section for section in FORM.sections]
+    return FormSchema(FORM.organisation, FORM.title, sections)
+
+
+def wide_options_draft(schema, words_per_cell=15, seed=0):
+    rng = random.Random(seed)
+    data = {}
+    for section in schema.sections:
+        if isinstance(section, OptionsTable):
+            for col in range(1, len(section.columns) + 1):
+                for row in section.rows:
+                    data[section.key_format.format(col=col, row=row)] = \
+                        " ".join(rng.choice(WORDS) for _ in range(words_per_cell))
+        elif isinstance(section, FieldBoxes):
+            for field in section.fields:
+                data[field.key] = " ".join(rng.choice(WORDS) for _ in range(words_per_cell))
+        elif isinstance(section, NumberedBoxes):
+            for i in range(1, section.count + 1):
+                data[section.key_format.format(i=i)] = " ".join(rng.choice(WORDS) for _ in range(words_per_cell))
+    return data
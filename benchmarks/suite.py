@@ -0,0 +1,343 @@
+"""Reproducible benchmark suite: text measurement, end-to-end renders and load.
+
+Three sections, each seeded so runs are comparable:
+
+  micro   layout_text/word_width and the full layout pass per draft profile
+  render  POST /submit through the Flask test client with the PDF cache off,
+          in the standard and compact output profiles
+  load    concurrent clients mixing page loads, autosaves, listings and renders
+
+Results are written as JSON. Run from the repository root:
+
+    python -m benchmarks.suite --output results.json [--quick] [--database-url URL]
+    python -m benchmarks.suite --compare before.json after.json
+
+The load section needs PostgreSQL: pass --database-url (or set
+BENCH_DATABASE_URL), otherwise a throwaway server is started with the optional
+`pgserver` package. Without either the load section is skipped. Test clients
+share one process, so it measures pool contention and database time rather
+than multi-worker throughput.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from benchmarks.drafts import DRAFT_PROFILES, QUICK_PROFILES, wide_options_draft, wide_options_schema
+
+# Operation mix for the load section, as (name, weight).
+LOAD_MIX = (("autosave", 50), ("load", 25), ("list", 15), ("render", 10))
+
+
+def summarize(seconds):
+    """Latency summary in milliseconds."""
+    ms = sorted(s * 1000 for s in seconds)
+    return {
+        "n": len(ms),
+        "min_ms": round(ms[0], 4),
+        "median_ms": round(statistics.median(ms), 4),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4),
+        "max_ms": round(ms[-1], 4),
+    }
+
+
+def time_calls(fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def environment(args):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "render_mode": os.environ.get("PDF_RENDER_MODE", "redraw"),
+        "args": {k: v for k, v in vars(args).items() if k not in ("database_url", "compare")},
+    }
+
+
+# --- micro ---
+
+def bench_micro(profiles, repeat):
+    from pdfrender import LAYOUT_PLAN
+    from textlayout import layout_text, word_width
+
+    text_width = LAYOUT_PLAN.width - 110  # full-width field box
+    results = {"layout_text": {}, "layout_text_cold": {}, "plan_layout": {}}
+    for name in profiles:
+        data = DRAFT_PROFILES[name]()
+        text = data.get("Problem", "")
+        results["layout_text"][name] = summarize(time_calls(lambda: layout_text(text, text_width), repeat))
+        results["layout_text_cold"][name] = summarize(
+            time_calls(lambda: layout_text(text, text_width), repeat, setup=word_width.cache_clear))
+        results["plan_layout"][name] = summarize(
+            time_calls(lambda: [op.layout(data) for op in LAYOUT_PLAN.ops], repeat))
+
+    words = DRAFT_PROFILES["typical"]()["Problem"].split()
+    word_width.cache_clear()
+    results["word_width_miss"] = summarize(
+        time_calls(lambda: [word_width(w + "x", "Helvetica", 10) for w in words], repeat,
+                   setup=word_width.cache_clear))
+    results["word_width_hit"] = summarize(
+        time_calls(lambda: [word_width(w, "Helvetica", 10) for w in words], repeat))
+    results["word_width_miss"]["words"] = results["word_width_hit"]["words"] = len(words)
+    return results
+
+
+# --- render ---
+
+def bench_render(app_module, profiles, repeat):
+    from pdfcache import PDFCache
+    from pdfrender import LAYOUT_PLAN, LayoutPlan, write_pdf
+
+    client = app_module.app.test_client()
+    cache = app_module.pdf_cache
+    results = {"submit": {}, "submit_cached": {}}
+    try:
+        app_module.pdf_cache = PDFCache(memory_bytes=0)
+        for name in profiles:
+            form = dict(DRAFT_PROFILES[name](), action="submit")
+            sizes = []
+
+            def submit():
+                response = client.post("/submit", data=form)
+                assert response.status_code == 200, response.status_code
+                sizes.append(len(response.data))
+
+            submit()  # warm images, template overlay and fonts
+            results["submit"][name] = dict(summarize(time_calls(submit, repeat)), pdf_bytes=sizes[-1])
+
+        results["submit_compact"] = {}
+        form = dict(DRAFT_PROFILES["typical"](), action="submit")
+        sizes = []
+
+        def submit_compact():
+            response = client.post("/submit?profile=compact", data=form)
+            assert response.status_code == 200, response.status_code
+            sizes.append(len(response.data))
+
+        submit_compact()
+        results["submit_compact"]["typical"] = dict(summarize(time_calls(submit_compact, repeat)),
+                                                    pdf_bytes=sizes[-1])
+
+        app_module.pdf_cache = PDFCache()
+        form = dict(DRAFT_PROFILES["typical"](), action="submit")
+        client.post("/submit", data=form)
+        results["submit_cached"]["typical"] = summarize(
+            time_calls(lambda: client.post("/submit", data=form), repeat))
+    finally:
+        app_module.pdf_cache = cache
+
+    # Tables longer than the web form allows, rendered straight from a plan.
+    results["wide_options_table"] = {}
+    for n_rows in (5, 50):
+        plan = LayoutPlan(wide_options_schema(n_rows), LAYOUT_PLAN.pagesize)
+        data = wide_options_draft(plan.schema)
+        results["wide_options_table"][f"{n_rows}_rows"] = summarize(
+            time_calls(lambda: write_pdf(data, io.BytesIO(), plan=plan), repeat))
+    return results
+
+
+# --- load ---
+
+def bench_load(app_module, threads, requests_per_thread, seed_drafts):
+    app_module.init_db()
+    prefix = f"bench-{uuid.uuid4().hex[:8]}-"
+    for i in range(seed_drafts):
+        app_module.save_draft_to_db(f"{prefix}seed-{i:05d}", DRAFT_PROFILES["short"]())
+
+    samples = {name: [] for name, _ in LOAD_MIX}
+    statuses = {}
+    lock = threading.Lock()
+    ops, weights = zip(*LOAD_MIX)
+
+    def worker(n):
+        rng = random.Random(n)
+        client = app_module.app.test_client()
+        name = f"{prefix}client-{n:03d}"
+        data = DRAFT_PROFILES["typical"]()
+        client.post("/submit", data=dict(data, action="save", draft_name=name))
+        version = app_module.load_draft_with_version(name)[1]
+        for i in range(requests_per_thread):
+            op = rng.choices(ops, weights)[0]
+            started = time.perf_counter()
+            if op == "autosave":
+                field = rng.choice(list(data))
+                data[field] = f"{data[field]} edit{i}"
+                response = client.post("/drafts/autosave",
+                                       json={"name": name, "version": version, "changed": {field: data[field]}})
+                if response.status_code == 200:
+                    version = response.get_json()["version"]
+            elif op == "load":
+                response = client.get("/", query_string={"draft": name})
+            elif op == "list":
+                response = client.get("/drafts", query_string={"q": prefix + "seed-0" + str(rng.randrange(10))})
+            else:
+                response = client.post("/submit", data=dict(data, action="submit", draft_name=name))
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples[op].append(elapsed)
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    wall = time.perf_counter() - started
+
+    with app_module.db_connection() as conn:
+        conn.cursor().execute("DELETE FROM drafts WHERE name LIKE %s", (prefix + "%",))
+
+    total = sum(len(s) for s in samples.values())
+    return {
+        "threads": threads,
+        "requests": total,
+        "wall_seconds": round(wall, 4),
+        "requests_per_second": round(total / wall, 2),
+        "statuses": statuses,
+        "all": summarize([s for ss in samples.values() for s in ss]),
+        "ops": {name: summarize(s) for name, s in samples.items() if s},
+        "pool": app_module.db_pool.stats(),
+    }
+
+
+def start_database():
+    """Return (database URL or None, cleanup callable)."""
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if url:
+        return url, lambda: None
+    try:
+        import pgserver
+    except ImportError:
+        return None, lambda: None
+    tmp = tempfile.TemporaryDirectory(prefix="bench-pg-")
+    server = pgserver.get_server(tmp.name, cleanup_mode="delete")
+
+    def cleanup():
+        server.cleanup()
+        tmp.cleanup()
+    return server.get_uri(), cleanup
+
+
+# --- compare ---
+
+def flatten(results, path=()):
+    """Yield (path, summary) for every latency summary in a results tree."""
+    for key, value in results.items():
+        if isinstance(value, dict) and "median_ms" in value:
+            yield "/".join(path + (key,)), value
+        elif isinstance(value, dict):
+            yield from flatten(value, path + (key,))
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = dict(flatten(json.load(f)["results"]))
+    with open(after_path) as f:
+        after = dict(flatten(json.load(f)["results"]))
+    print(f"{'benchmark':<48} {'before ms':>11} {'after ms':>11} {'change':>8}")
+    for path in sorted(before.keys() & after.keys()):
+        old, new = before[path]["median_ms"], after[path]["median_ms"]
+        change = f"{(new - old) / old * 100:+7.1f}%" if old else "    n/a"
+        print(f"{path:<48} {old:11.3f} {new:11.3f} {change}")
+    for path in sorted(before.keys() ^ after.keys()):
+        print(f"{path:<48} only in {'before' if path in before else 'after'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", "-o", help="write JSON results here (default: stdout)")
+    parser.add_argument("--sections", default="micro,render,load", help="comma-separated subset to run")
+    parser.add_argument("--quick", action="store_true", help="skip the very large profile and cut repetitions")
+    parser.add_argument("--repeat", type=int, help="timed repetitions per benchmark (default 20, 5 with --quick)")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent clients in the load section")
+    parser.add_argument("--requests", type=int, default=50, help="requests per client in the load section")
+    parser.add_argument("--seed-drafts", type=int, default=200, help="extra drafts created for listing queries")
+    parser.add_argument("--database-url", help="PostgreSQL for the load section (overrides BENCH_DATABASE_URL)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sections = [s.strip() for s in args.sections.split(",") if s.strip()]
+    repeat = args.repeat or (5 if args.quick else 20)
+    profiles = QUICK_PROFILES if args.quick else tuple(DRAFT_PROFILES)
+    if args.database_url:
+        os.environ["BENCH_DATABASE_URL"] = args.database_url
+
+    cleanup = lambda: None  # noqa: E731
+    database_url = None
+    if "load" in sections:
+        database_url, cleanup = start_database()
+    # app reads its configuration at import time.
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    else:
+        os.environ["AUTO_INIT_DB"] = "0"
+    os.environ.pop("RENDER_JOBS_DIR", None)
+    os.environ.pop("PDF_CACHE_DIR", None)
+    # Saves would otherwise queue background thumbnail renders that compete
+    # with the measured requests.
+    os.environ["THUMBNAIL_WORKERS"] = "0"
+
+    import app as app_module
+
+    results = {}
+    skipped = {}
+    try:
+        if "micro" in sections:
+            print("micro...", file=sys.stderr)
+            results["micro"] = bench_micro(profiles, repeat)
+        if "render" in sections:
+            print("render...", file=sys.stderr)
+            results["render"] = bench_render(app_module, profiles, repeat)
+        if "load" in sections:
+            if database_url:
+                print("load...", file=sys.stderr)
+                results["load"] = bench_load(app_module, args.threads, args.requests, args.seed_drafts)
+            else:
+                skipped["load"] = "no database: pass --database-url or install pgserver"
+                print(f"load skipped: {skipped['load']}", file=sys.stderr)
+    finally:
+        app_module.db_pool.close()
+        cleanup()
+
+    report = {"environment": environment(args), "results": results, "skipped": skipped}
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from pdfrender import render_pdf
+
+UNSAFE_FILENAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def iter_drafts(conn, batch_size=100):
+    """Yield (name, content dict) for every draft using a server-side cursor.
+
+    Only `batch_size` rows are held client-side at a time, so memory stays flat
+    however many drafts there are.
+    """
+    c = conn.cursor(name="bulk_export_drafts")
+    c.itersize = batch_size
+    c.execute("SELECT name, content FROM drafts ORDER BY name")
+    for name, content in c:
+        yield name, content
+    c.close()
+
+
+def _render_named(name, data, profile=None, renderer=None):
+    return name, render_pdf(data, profile=profile, renderer=renderer)
+
+
+def render_many(drafts, max_workers=None, profile=None, renderer=None):
+    """Render (name, data) pairs across a process pool, yielding (name, pdf) in input order.
+
+    At most two jobs per worker are in flight, so the iterator is consumed
+    lazily and finished PDFs never pile up in memory.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    window = deque()
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        for name, data in drafts:
+            window.append(executor.submit(_render_named, name, data, profile, renderer))
+            if len(window) >= max_workers * 2:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+
+class _ChunkSink:
+    """Write-only, unseekable file object that collects zipfile output for streaming."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def pdf_filename(name, seen):
+    base = UNSAFE_FILENAME_CHARS.sub("_", name).strip() or "draft"
+    filename = f"{base}.pdf"
+    n = 1
+    while filename in seen:
+        n += 1
+        filename = f"{base} ({n}).pdf"
+    seen.add(filename)
+    return filename
+
+
+def stream_zip(named_pdfs):
+    """Yield a ZIP archive of (name, pdf bytes) pairs chunk by chunk.
+
+    zipfile writes data descriptors when its output is unseekable, so each
+    entry can be flushed to the client as soon as it is added.
+    """
+    sink = _ChunkSink()
+    seen = set()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, pdf_bytes in named_pdfs:
+            info = zipfile.ZipInfo(pdf_filename(name, seen), date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, pdf_bytes)
+            yield sink.drain()
+    yield sink.drain()
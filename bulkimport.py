@@ -0,0 +1,124 @@
+"""Bulk import, upsert and delete of drafts.
+
+Input is consumed lazily and written `batch_size` rows per statement, one
+transaction per batch, so memory stays flat however large the input is. If
+something fails part way, earlier batches stay committed; upserting the
+same input again is safe.
+"""
+import json
+from collections import namedtuple
+from itertools import islice
+
+from psycopg2.extras import execute_values
+
+ImportResult = namedtuple("ImportResult", "inserted updated unchanged")
+
+# "insert" leaves drafts that already exist untouched; "upsert" replaces
+# their content (bumping version, like any other write) when it differs.
+IMPORT_MODES = ("insert", "upsert")
+
+INSERT_SQL = """
+    INSERT INTO drafts (name, content) VALUES %s
+    ON CONFLICT (name) DO NOTHING
+    RETURNING true
+"""
+UPSERT_SQL = """
+    INSERT INTO drafts (name, content) VALUES %s
+    ON CONFLICT (name) DO UPDATE SET content = EXCLUDED.content, version = drafts.version + 1
+    WHERE drafts.content IS DISTINCT FROM EXCLUDED.content
+    RETURNING xmax = 0
+"""
+DELETE_SQL = "DELETE FROM drafts WHERE name = ANY(%s)"
+
+
+def batched(iterable, size):
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def import_drafts(connection, drafts, mode="upsert", batch_size=1000, progress=None, on_batch=None):
+    """Write (name, content dict) pairs to the drafts table; returns an ImportResult.
+
+    `connection` is a zero-argument callable returning a context manager
+    that yields a connection and commits on exit (app.db_connection).
+    progress(n) is called with the number of drafts processed after each
+    batch commits, and on_batch(names) with the names that batch wrote.
+    """
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"unknown import mode {mode!r}")
+    inserted = updated = processed = 0
+    for batch in batched(drafts, batch_size):
+        # A statement may only touch each row once; the last copy of a name wins.
+        rows = {name: json.dumps(content) for name, content in batch}
+        with connection() as conn:
+            c = conn.cursor()
+            returned = execute_values(c, UPSERT_SQL if mode == "upsert" else INSERT_SQL, list(rows.items()),
+                                      template="(%s, %s::jsonb)", page_size=len(rows), fetch=True)
+        new = sum(1 for (is_insert,) in returned if is_insert)
+        inserted += new
+        updated += len(returned) - new
+        processed += len(batch)
+        if on_batch:
+            on_batch(list(rows))
+        if progress:
+            progress(processed)
+    return ImportResult(inserted, updated, processed - inserted - updated)
+
+
+def delete_drafts(connection, names, batch_size=1000, progress=None, on_batch=None):
+    """Delete the named drafts in batches; returns how many existed and were deleted.
+
+    `connection`, progress and on_batch are as for import_drafts().
+    """
+    deleted = processed = 0
+    for batch in batched(names, batch_size):
+        with connection() as conn:
+            c = conn.cursor()
+            c.execute(DELETE_SQL, (batch,))
+            deleted += c.rowcount
+        processed += len(batch)
+        if on_batch:
+            on_batch(batch)
+        if progress:
+            progress(processed)
+    return deleted
+
+
+def read_jsonl(lines):
+    """Yield (name, content) from JSON Lines records of the form {"name": ..., "content": {...}}.
+
+    Blank lines are skipped; a malformed record, or a content field that isn't text,
+    raises ValueError naming its line.
+    """
+    for lineno, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            raise ValueError(f"line {lineno}: {exc}") from None
+        if not isinstance(record, dict) or not isinstance(record.get("name"), str) or not record["name"] \
+                or not isinstance(record.get("content"), dict):
+            raise ValueError(f'line {lineno}: expected {{"name": "...", "content": {{...}}}}')
+        for key, value in record["content"].items():
+            if not isinstance(value, str):
+                raise ValueError(f"line {lineno}: content field {key!r} must be text, not {type(value).__name__}")
+        yield record["name"], record["content"]
+
+
+def read_names(lines):
+    """Yield draft names, one per line; JSON Lines records ({"name": ...}) are accepted too."""
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if isinstance(record, dict) and isinstance(record.get("name"), str):
+                yield record["name"]
+                continue
+        yield line
@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """Per-process PostgreSQL connection pool.
+
+    Wraps psycopg2's ThreadedConnectionPool with a semaphore so callers block
+    (up to `timeout` seconds) instead of failing when every connection is in
+    use. The pool remembers the pid that created it; after a fork (gunicorn
+    --preload) the child builds its own connections and never touches the
+    parent's sockets.
+    """
+
+    def __init__(self, dsn, minconn=1, maxconn=5, timeout=10.0, health_check_interval=30.0):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._slots = None
+        self._last_used = {}
+        self._orphaned = []
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "wait_seconds_total": 0.0,
+            "wait_seconds_max": 0.0,
+        }
+
+    def _ensure_pool(self):
+        pid = os.getpid()
+        if self._pool is not None and self._pid == pid:
+            return
+        with self._lock:
+            if self._pool is not None and self._pid == pid:
+                return
+            # Connections inherited across fork belong to the parent. Keep them
+            # referenced (never closed or garbage-collected) in the child so
+            # libpq doesn't send a terminate message over the shared socket.
+            if self._pool is not None:
+                self._orphaned.append(self._pool)
+            self._pool = pg_pool.ThreadedConnectionPool(self.minconn, self.maxconn, self.dsn)
+            self._slots = threading.BoundedSemaphore(self.maxconn)
+            self._last_used = {}
+            self._pid = pid
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as c:
+                c.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        self._ensure_pool()
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise PoolTimeout(f"no database connection available after {self.timeout}s")
+        waited = time.monotonic() - started
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_seconds_total"] += waited
+            self._stats["wait_seconds_max"] = max(self._stats["wait_seconds_max"], waited)
+        try:
+            conn = self._pool.getconn()
+            if not self._healthy(conn):
+                with self._lock:
+                    self._stats["health_check_failures"] += 1
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        return conn
+
+    def _checkin(self, conn, broken=False):
+        if self._pid != os.getpid():
+            return
+        if broken or conn.closed:
+            self._last_used.pop(id(conn), None)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._pool.putconn(conn, close=broken or bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """Yield a pooled connection; commit on success, roll back on error."""
+        conn = self._checkout()
+        broken = False
+        try:
+            yield conn
+            conn.commit()
+        except Exception as exc:
+            broken = isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+            raise
+        finally:
+            self._checkin(conn, broken=broken)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["min_size"] = self.minconn
+        stats["max_size"] = self.maxconn
+        if self._pool is not None and self._pid == os.getpid():
+            stats["in_use"] = len(self._pool._used)
+            stats["idle"] = len(self._pool._pool)
+        else:
+            stats["in_use"] = 0
+            stats["idle"] = 0
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.closeall()
+            self._pool = None
+            self._pid = None
+
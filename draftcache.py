@@ -0,0 +1,256 @@
+"""Per-process read cache for drafts, kept coherent across workers.
+
+Each worker caches draft contents and /drafts listing pages in bounded LRUs
+with a TTL. The worker that writes a draft invalidates its own cache
+straight away. Every other worker hears about the write through a trigger
+on the drafts table that NOTIFYs CHANNEL, which ChangeListener LISTENs to on
+a dedicated connection.
+
+Notification payloads are "U:<name>" (content of an existing draft changed),
+"M:<name>" (draft created, deleted or renamed, so listings change too) or ""
+(anything may have changed; drop everything).
+"""
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg2
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "drafts_changed"
+# NOTIFY payloads are capped at 8000 bytes; longer names fall back to "".
+MAX_PAYLOAD_NAME_BYTES = 7000
+
+
+class DraftCache:
+    """LRU of draft (content, version) pairs and listing pages, with a TTL.
+
+    Loads that race with an invalidation are returned but not stored, so a
+    read that started before a write can never repopulate the cache with
+    the old value.
+    """
+
+    def __init__(self, max_entries=1024, max_lists=256, ttl=30.0):
+        self.max_entries = max_entries
+        self.max_lists = max_lists
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._drafts = OrderedDict()
+        self._lists = OrderedDict()
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "resets": 0}
+
+    def get_draft(self, name, loader):
+        """Return (content, version) for `name`, calling loader() on a miss."""
+        content, version = self._lookup(self._drafts, self.max_entries, name, loader)
+        return dict(content), version
+
+    def get_list(self, key, loader):
+        """Return the listing for a hashable `key` (its filters), calling loader() on a miss.
+
+        Keys whose first element is true are treated as filtering on
+        content, so they are dropped on any write rather than only when a
+        draft is created or deleted.
+        """
+        return list(self._lookup(self._lists, self.max_lists, key, loader))
+
+    async def get_draft_async(self, name, loader):
+        """get_draft() for a coroutine function loader."""
+        hit, value, generation = self._get(self._drafts, name)
+        if not hit:
+            value = self._put(self._drafts, self.max_entries, name, await loader(), generation)
+        return dict(value[0]), value[1]
+
+    async def get_list_async(self, key, loader):
+        """get_list() for a coroutine function loader."""
+        hit, value, generation = self._get(self._lists, key)
+        if not hit:
+            value = self._put(self._lists, self.max_lists, key, await loader(), generation)
+        return list(value)
+
+    def _lookup(self, table, max_size, key, loader):
+        hit, value, generation = self._get(table, key)
+        if hit:
+            return value
+        return self._put(table, max_size, key, loader(), generation)
+
+    def _get(self, table, key):
+        """Return (hit, value, generation); pass the generation on to _put after a miss."""
+        with self._lock:
+            entry = table.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                table.move_to_end(key)
+                self._stats["hits"] += 1
+                return True, entry[1], None
+            self._stats["misses"] += 1
+            return False, None, self._generation
+
+    def _put(self, table, max_size, key, value, generation):
+        stored = (dict(value[0]), value[1]) if table is self._drafts else tuple(value)
+        with self._lock:
+            if generation == self._generation and max_size > 0:
+                table[key] = (time.monotonic() + self.ttl, stored)
+                table.move_to_end(key)
+                while len(table) > max_size:
+                    table.popitem(last=False)
+        return stored
+
+    def invalidate(self, name, membership=True):
+        """Forget `name`; `membership` means the set of drafts changed, not just its content."""
+        with self._lock:
+            self._generation += 1
+            self._stats["invalidations"] += 1
+            self._drafts.pop(name, None)
+            if membership:
+                self._lists.clear()
+            else:
+                for key in [key for key in self._lists if key[0]]:
+                    del self._lists[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._stats["resets"] += 1
+            self._drafts.clear()
+            self._lists.clear()
+
+    def apply_notification(self, payload):
+        kind, _, name = payload.partition(":")
+        if kind in ("U", "M") and name:
+            self.invalidate(name, membership=kind == "M")
+        else:
+            self.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["drafts"] = len(self._drafts)
+            stats["lists"] = len(self._lists)
+        return stats
+
+
+class ChangeListener:
+    """LISTENs on `channel` from a background thread and hands each payload to on_notify.
+
+    on_reset() is called whenever notifications may have been missed (when
+    the connection is lost and again once it is back), and `live` is false
+    until the LISTEN is in place, so callers should bypass their cache
+    while it is false. The thread is started lazily per process, so a
+    listener created before a fork starts afresh in each worker.
+    """
+
+    def __init__(self, dsn, channel, on_notify, on_reset, poll_interval=5.0, max_retry_interval=30.0):
+        self.dsn = dsn
+        self.channel = channel
+        self.on_notify = on_notify
+        self.on_reset = on_reset
+        self.poll_interval = poll_interval
+        self.max_retry_interval = max_retry_interval
+        self.live = False
+        self._lock = threading.Lock()
+        self._pid = None
+        self._stop = threading.Event()
+
+    def ensure_running(self):
+        """Start the listener thread in this process if needed; return whether it is live."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self.live = False
+                    self._stop = threading.Event()
+                    threading.Thread(target=self._run, args=(self._stop,), daemon=True,
+                                     name=f"listen-{self.channel}").start()
+                    self._pid = os.getpid()
+        return self.live
+
+    def stop(self):
+        self._stop.set()
+        self.live = False
+        self._pid = None
+
+    def _run(self, stop):
+        retry_interval = 1.0
+        while not stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.autocommit = True
+                conn.cursor().execute(f"LISTEN {self.channel}")
+                # Anything written before LISTEN took effect was missed.
+                self.on_reset()
+                self.live = True
+                retry_interval = 1.0
+                while not stop.is_set():
+                    if select.select([conn], [], [], self.poll_interval) == ([], [], []):
+                        # Idle: make sure the connection is still there.
+                        conn.cursor().execute("SELECT 1")
+                    conn.poll()
+                    while conn.notifies:
+                        self.on_notify(conn.notifies.pop(0).payload)
+            except Exception:
+                if not stop.is_set():
+                    log.warning("lost LISTEN %s connection; retrying", self.channel, exc_info=True)
+            finally:
+                self.live = False
+                self.on_reset()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+            stop.wait(retry_interval)
+            retry_interval = min(retry_interval * 2, self.max_retry_interval)
+
+
+def install_change_trigger(conn):
+    """Create (or update) the trigger that NOTIFYs CHANNEL on every change to drafts."""
+    c = conn.cursor()
+    c.execute(f"""
+        CREATE OR REPLACE FUNCTION drafts_notify_change() RETURNS trigger AS $$
+        DECLARE
+            names TEXT[];
+            kind TEXT := 'M';
+            draft_name TEXT;
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                PERFORM pg_notify('{CHANNEL}', '');
+                RETURN NULL;
+            ELSIF TG_OP = 'INSERT' THEN
+                names := ARRAY[NEW.name];
+            ELSIF TG_OP = 'DELETE' THEN
+                names := ARRAY[OLD.name];
+            ELSIF OLD.name = NEW.name THEN
+                names := ARRAY[NEW.name];
+                kind := 'U';
+            ELSE
+                names := ARRAY[OLD.name, NEW.name];
+            END IF;
+            FOREACH draft_name IN ARRAY names LOOP
+                PERFORM pg_notify('{CHANNEL}', CASE WHEN octet_length(draft_name) > {MAX_PAYLOAD_NAME_BYTES}
+                                                    THEN '' ELSE kind || ':' || draft_name END);
+            END LOOP;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # Check first rather than DROP/CREATE so worker start-up never takes a
+    # table lock once the triggers exist.
+    c.execute("""
+        SELECT tgname FROM pg_trigger
+        WHERE tgrelid = 'drafts'::regclass AND tgname IN ('drafts_notify_change', 'drafts_notify_truncate')
+    """)
+    existing = {row[0] for row in c.fetchall()}
+    if "drafts_notify_change" not in existing:
+        c.execute("""
+            CREATE TRIGGER drafts_notify_change AFTER INSERT OR UPDATE OR DELETE ON drafts
+            FOR EACH ROW EXECUTE FUNCTION drafts_notify_change()
+        """)
+    if "drafts_notify_truncate" not in existing:
+        c.execute("""
+            CREATE TRIGGER drafts_notify_truncate AFTER TRUNCATE ON drafts
+            FOR EACH STATEMENT EXECUTE FUNCTION drafts_notify_change()
+        """)
@@ -0,0 +1,160 @@
+"""Full-text search over draft contents.
+
+drafts.search_vector holds a weighted tsvector of the draft's fields, kept up
+to date by a BEFORE INSERT/UPDATE trigger and indexed with GIN. Fields are
+weighted by SEARCH_WEIGHTS, so a match in the Topic outranks the same match
+in a key action. Changing the weights needs `flask rebuild-search`.
+"""
+import html
+
+from formschema import FORM, OptionsTable
+from migrations import create_index_concurrently
+
+SEARCH_CONFIG = "english"
+
+# Fields not listed here (key actions, role, ...) get weight "D". Form
+# bookkeeping keys saved alongside the content are not indexed at all.
+SEARCH_WEIGHTS = {
+    "Topic": "A",
+    "Problem": "B",
+    "Outcome": "B",
+    "Recommendation": "B",
+    "Decision": "B",
+    "PointPerson": "C",
+    "Sponsor": "C",
+}
+for _section in FORM.sections:
+    if isinstance(_section, OptionsTable):
+        for _col in range(1, len(_section.columns) + 1):
+            for _row in _section.rows:
+                SEARCH_WEIGHTS[_section.key_format.format(col=_col, row=_row)] = "C"
+UNINDEXED_FIELDS = ("action", "draft_name")
+
+# Snippet delimiters. drafts_search_text() strips them from the document, so
+# the snippet can be HTML-escaped first and the highlights marked up after.
+HEADLINE_OPTIONS = 'StartSel="\x01", StopSel="\x02", MaxFragments=2, MaxWords=25, MinWords=8'
+
+
+def _sql_literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _fields_text(keys):
+    return "concat_ws(' ', " + ", ".join(f"content->>{_sql_literal(k)}" for k in keys) + ")"
+
+
+def _search_functions_sql():
+    weighted = {}
+    for key, weight in SEARCH_WEIGHTS.items():
+        weighted.setdefault(weight, []).append(key)
+    skip = "ARRAY[" + ", ".join(_sql_literal(k) for k in (*SEARCH_WEIGHTS, *UNINDEXED_FIELDS)) + "]"
+    rest = f"coalesce((SELECT string_agg(value, ' ') FROM jsonb_each_text(content) WHERE key <> ALL ({skip})), '')"
+    vector = " || ".join(
+        [f"setweight(to_tsvector('{SEARCH_CONFIG}', {_fields_text(keys)}), '{weight}')"
+         for weight, keys in sorted(weighted.items())]
+        + [f"setweight(to_tsvector('{SEARCH_CONFIG}', {rest}), 'D')"]
+    )
+    text = f"translate(concat_ws(' ', {_fields_text(SEARCH_WEIGHTS)}, {rest}), chr(1) || chr(2), '')"
+    return f"""
+        CREATE OR REPLACE FUNCTION drafts_search_vector(content JSONB) RETURNS tsvector AS $$
+            SELECT {vector}
+        $$ LANGUAGE sql IMMUTABLE;
+
+        CREATE OR REPLACE FUNCTION drafts_search_text(content JSONB) RETURNS TEXT AS $$
+            SELECT {text}
+        $$ LANGUAGE sql IMMUTABLE;
+
+        CREATE OR REPLACE FUNCTION drafts_set_search_vector() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := drafts_search_vector(NEW.content);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+    """
+
+
+def install_search(connection, batch_size=1000, progress=None):
+    """Add the search column, its trigger and GIN index, and index any unindexed drafts.
+
+    Safe to run repeatedly and against a live database: the column is added
+    without a default, existing rows are filled in committed batches and the
+    index is built concurrently. `connection` is as for
+    migrations.migrate_content_to_jsonb(). Returns the number of drafts indexed.
+    """
+    with connection() as conn:
+        c = conn.cursor()
+        c.execute("ALTER TABLE drafts ADD COLUMN IF NOT EXISTS search_vector tsvector")
+        c.execute(_search_functions_sql())
+        c.execute("SELECT 1 FROM pg_trigger WHERE tgrelid = 'drafts'::regclass AND tgname = 'drafts_set_search_vector'")
+        if c.fetchone() is None:
+            c.execute("""
+                CREATE TRIGGER drafts_set_search_vector BEFORE INSERT OR UPDATE OF content ON drafts
+                FOR EACH ROW EXECUTE FUNCTION drafts_set_search_vector()
+            """)
+    indexed = backfill_search_vector(connection, batch_size, progress)
+    create_index_concurrently(connection, "drafts_search_idx", "drafts USING gin (search_vector)")
+    return indexed
+
+
+def backfill_search_vector(connection, batch_size=1000, progress=None, rebuild=False):
+    """Fill in search_vector for drafts that lack one, `batch_size` rows per transaction.
+
+    With rebuild, walk the whole table and recompute every vector that no
+    longer matches the current weights. Returns the number of rows updated.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        with connection() as conn:
+            c = conn.cursor()
+            if rebuild:
+                c.execute("SELECT max(id) FROM (SELECT id FROM drafts WHERE id > %s ORDER BY id LIMIT %s) batch",
+                          (last_id, batch_size))
+                batch_end = c.fetchone()[0]
+                if batch_end is None:
+                    break
+                c.execute("""
+                    UPDATE drafts SET search_vector = drafts_search_vector(content)
+                    WHERE id > %s AND id <= %s AND search_vector IS DISTINCT FROM drafts_search_vector(content)
+                """, (last_id, batch_end))
+                last_id = batch_end
+            else:
+                c.execute("""
+                    UPDATE drafts SET search_vector = drafts_search_vector(content)
+                    WHERE id IN (
+                        SELECT id FROM drafts WHERE search_vector IS NULL
+                        ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+                    )
+                """, (batch_size,))
+                if c.rowcount == 0:
+                    break
+            updated += c.rowcount
+        if progress:
+            progress(updated)
+    return updated
+
+
+# Rank a page of matches first, then build snippets for that page only:
+# ts_headline re-parses the whole document, so it is by far the costliest part.
+SEARCH_DRAFTS_SQL = f"""
+    SELECT name, rank, ts_headline('{SEARCH_CONFIG}', drafts_search_text(content), query, %s)
+    FROM (
+        SELECT name, content, query, ts_rank(search_vector, query, 1) AS rank
+        FROM drafts, websearch_to_tsquery('{SEARCH_CONFIG}', %s) AS query
+        WHERE search_vector @@ query
+        ORDER BY rank DESC, name
+        LIMIT %s OFFSET %s
+    ) page
+    ORDER BY rank DESC, name
+"""
+
+
+def search_drafts_query(q, limit, offset=0):
+    return SEARCH_DRAFTS_SQL, (HEADLINE_OPTIONS, q, limit, offset)
+
+
+def search_result(row):
+    """Turn a SEARCH_DRAFTS_SQL row into {"name", "rank", "snippet"}; the snippet is HTML with <mark> highlights."""
+    name, rank, headline = row
+    snippet = html.escape(headline).replace("\x01", "<mark>").replace("\x02", "</mark>")
+    return {"name": name, "rank": round(rank, 6), "snippet": snippet}
@@ -0,0 +1,87 @@
+"""Declarative description of the Strategic Topic Summary form.
+
+Both templates/form.html and the PDF renderer are driven from FORM, so a
+field is added (or a new form variant defined) in one place. pdfrender
+compiles a schema into a layout plan once at import time.
+"""
+from collections import namedtuple
+
+# widget is "input" or "textarea"; html_row groups short inputs onto one line
+# of the web form; html_style is extra inline CSS for the widget.
+Field = namedtuple("Field", "key label widget html_row html_style", defaults=(None, None))
+
+# One labelled, full-width text box per field in the PDF.
+FieldBoxes = namedtuple("FieldBoxes", "fields gap_after kind", defaults=("fields",))
+
+# A grid of textareas: one row per entry in `rows`, one column per entry in
+# `columns`; cell keys come from key_format.format(col=<1-based>, row=<row>).
+OptionsTable = namedtuple("OptionsTable", "title columns rows key_format kind", defaults=("table",))
+
+# `count` numbered boxes keyed key_format.format(i=<1-based>).
+NumberedBoxes = namedtuple("NumberedBoxes", "title html_title count key_format html_label_format kind",
+                           defaults=("numbered",))
+
+# Start a new PDF page.
+PageBreak = namedtuple("PageBreak", "kind", defaults=("page_break",))
+
+FormSchema = namedtuple("FormSchema", "organisation title sections")
+
+
+FORM = FormSchema(
+    organisation="Turning Point for God",
+    title="Strategic / Ad hoc Topic Summary",
+    sections=[
+        FieldBoxes(
+            fields=[
+                Field("Topic", "Topic", "input", html_row=1),
+                Field("PointPerson", "Point Person", "input", html_row=2),
+                Field("Role", "Role of Executive Team (consult, inform, decide)", "input", html_row=2),
+                Field("Sponsor", "Executive Sponsor", "input", html_row=2),
+                Field("Problem", "Problem Definition", "textarea"),
+                Field("Outcome", "Outcome Description", "textarea"),
+                Field("Recommendation", "Primary Recommendation", "textarea"),
+            ],
+            gap_after=25,
+        ),
+        PageBreak(),
+        OptionsTable(
+            title="Options Table",
+            columns=["Option 1", "Option 2", "Option 3"],
+            rows=["Description", "Pros", "Cons", "Benefits/Revenue", "Obstacles"],
+            key_format="Option{col}{row}",
+        ),
+        FieldBoxes(
+            fields=[Field("Decision", "Final Decision", "textarea", html_style="width: 1100px")],
+            gap_after=35,
+        ),
+        NumberedBoxes(
+            title="Key Actions: (Who, What, When?)",
+            html_title="Key Actions (Who, What, When?)",
+            count=5,
+            key_format="Action{i}",
+            html_label_format="Key Action {i}",
+        ),
+    ],
+)
+
+
+def html_blocks(fields):
+    """Group fields for the web form: consecutive fields sharing an html_row
+    become one ("row", [fields]) block, anything else is ("field", field)."""
+    blocks = []
+    for field in fields:
+        if field.html_row is not None and blocks and blocks[-1][0] == "row" \
+                and blocks[-1][1][0].html_row == field.html_row:
+            blocks[-1][1].append(field)
+        elif field.html_row is not None:
+            blocks.append(("row", [field]))
+        else:
+            blocks.append(("field", field))
+    return blocks
+
+
+
+def field_text(data, key):
+    """A draft field's text; missing or non-text values (from old or hand-written rows) render empty."""
+    value = data.get(key)
+    return value if isinstance(value, str) else ""
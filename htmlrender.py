@@ -0,0 +1,81 @@
+"""WeasyPrint PDF backend: the form as HTML with a print stylesheet.
+
+templates/print.html is driven by the same FormSchema as the ReportLab
+layout plan, so new fields show up in both backends. Box heights, wrapping
+and page breaks are left to CSS (static/print.css) instead of being worked
+out by hand.
+
+WeasyPrint needs Pango at runtime, so it is imported on first use and the
+rest of the app runs without it; available() tells whether it loaded.
+"""
+import os
+import threading
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from formschema import field_text
+from metrics import histogram, timed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+PRINT_CSS_PATH = os.path.join(STATIC_DIR, "print.css")
+
+# Bump whenever print.html or print.css changes so cached PDFs are not reused.
+TEMPLATE_VERSION = "1"
+
+PDF_PHASE_SECONDS = histogram("pdf_render_phase_seconds", "Time spent in each phase of PDF generation.")
+
+_env = Environment(loader=FileSystemLoader(os.path.join(BASE_DIR, "templates")),
+                   autoescape=select_autoescape(["html"]), trim_blocks=True, lstrip_blocks=True)
+_env.globals.update(field_text=field_text)
+_lock = threading.Lock()
+_weasyprint = None
+_import_error = None
+_stylesheet = None
+# Decoded images shared between renders (WeasyPrint's `cache` option), one
+# cache per output profile since images are prepared for its resolution.
+_image_caches = {}
+
+
+def _load():
+    global _weasyprint, _import_error, _stylesheet
+    if _weasyprint is None and _import_error is None:
+        with _lock:
+            if _weasyprint is None and _import_error is None:
+                try:
+                    import weasyprint
+                except (ImportError, OSError) as exc:  # OSError: Pango is missing
+                    _import_error = exc
+                else:
+                    _stylesheet = weasyprint.CSS(filename=PRINT_CSS_PATH)
+                    _weasyprint = weasyprint
+    if _weasyprint is None:
+        raise RuntimeError(f"WeasyPrint is not available: {_import_error}")
+    return _weasyprint
+
+
+def available():
+    try:
+        _load()
+    except RuntimeError:
+        return False
+    return True
+
+
+def render_html(data, schema, pagesize):
+    return _env.get_template("print.html").render(
+        data=data, schema=schema, page_width=pagesize[0], page_height=pagesize[1])
+
+
+def write_pdf(data, output, plan, mode, profile):
+    """Renderer entry point (see pdfrender.RENDERERS); `mode` only applies to ReportLab and is ignored."""
+    weasyprint = _load()
+    with timed(PDF_PHASE_SECONDS, renderer="weasyprint", phase="html"):
+        html = render_html(data, plan.schema, plan.pagesize)
+    options = {"stylesheets": [_stylesheet], "cache": _image_caches.setdefault(profile.name, {})}
+    if profile.image_dpi:
+        options.update(dpi=profile.image_dpi, optimize_images=True)
+    with timed(PDF_PHASE_SECONDS, renderer="weasyprint", phase="layout"):
+        document = weasyprint.HTML(string=html, base_url=STATIC_DIR + os.sep).render(**options)
+    with timed(PDF_PHASE_SECONDS, renderer="weasyprint", phase="save"):
+        document.write_pdf(output)
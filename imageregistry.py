@@ -0,0 +1,119 @@
+import copy
+import math
+import os
+import threading
+
+from PIL import Image
+from reportlab.lib.rl_accel import asciiBase85Decode
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfdoc
+
+
+class PreparedImage:
+    """An image decoded, masked and Flate-compressed once, ready to embed."""
+
+    __slots__ = ("path", "mtime", "xobject", "smask")
+
+    def __init__(self, path, mtime, xobject, smask):
+        self.path = path
+        self.mtime = mtime
+        self.xobject = xobject
+        self.smask = smask
+
+
+class ImageRegistry:
+    """Process-wide store of prepared header/footer images.
+
+    canvas.drawImage() re-reads, decodes and recompresses a PNG for every new
+    document. The registry builds the PDF image XObject (and its soft mask
+    for mask='auto') once per file and only rebuilds it when the file's mtime
+    changes, so each render just references the already-encoded stream.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._images = {}
+
+    def get(self, path, size=None, ascii85=True):
+        """Return the PreparedImage for `path`, or None if the file is missing.
+
+        `size` (width, height) in pixels caps the embedded resolution, and
+        ascii85=False stores the streams as binary Flate data; each
+        combination is prepared and cached separately.
+        """
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        key = (path, size, ascii85)
+        prepared = self._images.get(key)
+        if prepared is not None and prepared.mtime == mtime:
+            return prepared
+        with self._lock:
+            prepared = self._images.get(key)
+            if prepared is None or prepared.mtime != mtime:
+                prepared = self._prepare(path, mtime, size, ascii85)
+                self._images[key] = prepared
+        return prepared
+
+    def _prepare(self, path, mtime, size, ascii85):
+        variant = "" if size is None and ascii85 else "%s%s" % (size, ascii85)
+        name = pdfdoc._digester(("%s%s%s%s" % (path, mtime, "auto", variant)).encode("utf-8"))
+        source = path
+        if size is not None:
+            with Image.open(path) as im:
+                if im.width > size[0] or im.height > size[1]:
+                    im = im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB")
+                    source = ImageReader(im.resize((min(im.width, size[0]), min(im.height, size[1])),
+                                                   Image.LANCZOS))
+        xobject = pdfdoc.PDFImageXObject(name, source, mask="auto")
+        smask = getattr(xobject, "_smask", None)
+        if smask is not None:
+            del xobject._smask
+        if not ascii85:
+            for obj in (xobject, smask):
+                if obj is not None and obj._filters[:1] == ("ASCII85Decode",):
+                    obj.streamContent = asciiBase85Decode(obj.streamContent)
+                    obj._filters = obj._filters[1:]
+        return PreparedImage(path, mtime, xobject, smask)
+
+    def draw(self, p, path, x, y, width, height, dpi=None, ascii85=True):
+        """Draw the image at `path` onto canvas `p`; returns False if it is missing.
+
+        With `dpi`, the embedded image is downsampled to that resolution at
+        its drawn size. Mirrors the registration steps of canvas.drawImage()
+        but reuses the prepared XObject. Per-document state (resource dicts,
+        the soft-mask reference) is set on shallow copies so the cached
+        objects stay clean.
+        """
+        size = (math.ceil(width * dpi / 72), math.ceil(height * dpi / 72)) if dpi else None
+        prepared = self.get(path, size, ascii85)
+        if prepared is None:
+            return False
+        doc = p._doc
+        name = prepared.xobject.name
+        reg_name = doc.getXObjectName(name)
+        if reg_name not in doc.idToObject:
+            xobject = copy.copy(prepared.xobject)
+            p._setXObjects(xobject)
+            doc.Reference(xobject, reg_name)
+            doc.addForm(name, xobject)
+            if prepared.smask is not None:
+                mask_reg_name = doc.getXObjectName(prepared.smask.name)
+                if mask_reg_name not in doc.idToObject:
+                    smask = copy.copy(prepared.smask)
+                    p._setXObjects(smask)
+                    xobject.smask = doc.Reference(smask, mask_reg_name)
+                else:
+                    xobject.smask = pdfdoc.PDFObjectReference(mask_reg_name)
+        p._currentPageHasImages = 1
+        p.saveState()
+        p.translate(x, y)
+        p.scale(width, height)
+        p._code.append("/%s Do" % reg_name)
+        p.restoreState()
+        p._formsinuse.append(name)
+        return True
+
+
+images = ImageRegistry()
@@ -0,0 +1,139 @@
+"""Minimal in-process metrics with Prometheus text exposition.
+
+Histograms are per process (per gunicorn worker); scrape each worker or
+aggregate downstream. Gauges are pulled from registered collector callables
+at scrape time, so pool/cache stats are never stale.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_histograms = {}
+_collectors = []
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            series = self._series.get(key)
+            if series is None:
+                # One slot per bucket, then +Inf, sum and count.
+                series = self._series[key] = [0] * len(self.buckets) + [0, 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-3] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with _lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', _format(bound)),))} {count}")
+            lines.append(f"{self.name}_sum{_labels(key)} {values[-2]}")
+            lines.append(f"{self.name}_count{_labels(key)} {values[-1]}")
+        return lines
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    """Return the histogram called `name`, creating it on first use."""
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram(name, help_text, buckets)
+    return hist
+
+
+@contextmanager
+def timed(hist, **labels):
+    """Observe the wall time of a block (or, as a decorator, of each call)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        hist.observe(time.perf_counter() - started, **labels)
+
+
+def register_collector(fn):
+    """Register fn() -> [(name, help, type, [(labels dict, value)])] to be read at scrape time."""
+    _collectors.append(fn)
+    return fn
+
+
+def render():
+    lines = []
+    with _lock:
+        hists = list(_histograms.values())
+    for hist in hists:
+        lines.extend(hist.render())
+    for collector in _collectors:
+        for name, help_text, metric_type, samples in collector():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(tuple(sorted(labels.items())))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _format(value):
+    return value if isinstance(value, str) else repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every `interval` seconds.
+
+    stop() returns the samples in collapsed-stack format ("a;b;c 12"), which
+    flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self._stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common())
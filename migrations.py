@@ -0,0 +1,122 @@
+"""Online schema migrations for the drafts table.
+
+Each migration is written to run against a live database: schema changes
+take only brief locks and data is backfilled in small committed batches.
+"""
+
+CONTENT_TYPE_SQL = """
+    SELECT data_type FROM information_schema.columns
+    WHERE table_schema = current_schema() AND table_name = 'drafts' AND column_name = 'content'
+"""
+
+
+def content_column_type(conn):
+    c = conn.cursor()
+    c.execute(CONTENT_TYPE_SQL)
+    row = c.fetchone()
+    return row[0] if row else None
+
+
+def migrate_content_to_jsonb(connection, batch_size=1000, progress=None):
+    """Convert drafts.content from TEXT to JSONB without a table rewrite lock.
+
+    1. Add a nullable content_jsonb column and a trigger that keeps it in step
+       with writes made while the migration runs.
+    2. Backfill content_jsonb in batches of `batch_size`, one transaction each.
+    3. In one short transaction, catch up any stragglers and swap the columns.
+
+    `connection` is a zero-argument callable returning a context manager that
+    yields a connection and commits on exit (app.db_connection).
+    """
+    with connection() as conn:
+        if content_column_type(conn) == "jsonb":
+            return 0
+        c = conn.cursor()
+        c.execute("ALTER TABLE drafts ADD COLUMN IF NOT EXISTS content_jsonb JSONB")
+        c.execute("""
+            CREATE OR REPLACE FUNCTION drafts_sync_content_jsonb() RETURNS trigger AS $$
+            BEGIN
+                NEW.content_jsonb := NEW.content::jsonb;
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        c.execute("DROP TRIGGER IF EXISTS drafts_sync_content_jsonb ON drafts")
+        c.execute("""
+            CREATE TRIGGER drafts_sync_content_jsonb
+            BEFORE INSERT OR UPDATE OF content ON drafts
+            FOR EACH ROW EXECUTE FUNCTION drafts_sync_content_jsonb()
+        """)
+
+    migrated = 0
+    while True:
+        with connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                UPDATE drafts SET content_jsonb = content::jsonb
+                WHERE id IN (
+                    SELECT id FROM drafts WHERE content_jsonb IS NULL
+                    ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+                )
+            """, (batch_size,))
+            count = c.rowcount
+        migrated += count
+        if progress:
+            progress(migrated)
+        if count < batch_size:
+            break
+
+    with connection() as conn:
+        c = conn.cursor()
+        c.execute("LOCK TABLE drafts IN SHARE ROW EXCLUSIVE MODE")
+        c.execute("UPDATE drafts SET content_jsonb = content::jsonb WHERE content_jsonb IS NULL")
+        migrated += c.rowcount
+        c.execute("DROP TRIGGER drafts_sync_content_jsonb ON drafts")
+        c.execute("DROP FUNCTION drafts_sync_content_jsonb()")
+        c.execute("ALTER TABLE drafts DROP COLUMN content")
+        c.execute("ALTER TABLE drafts RENAME COLUMN content_jsonb TO content")
+        # NOT VALID skips the full-table scan under lock; validation below only
+        # takes a SHARE UPDATE EXCLUSIVE lock, which doesn't block writes.
+        c.execute("ALTER TABLE drafts ADD CONSTRAINT drafts_content_not_null CHECK (content IS NOT NULL) NOT VALID")
+    with connection() as conn:
+        c = conn.cursor()
+        c.execute("ALTER TABLE drafts VALIDATE CONSTRAINT drafts_content_not_null")
+    create_content_index(connection)
+    return migrated
+
+
+def create_content_index(connection):
+    """GIN index for containment queries such as content @> '{"Sponsor": "X"}'."""
+    create_index_concurrently(connection, "drafts_content_idx", "drafts USING gin (content jsonb_path_ops)")
+
+
+def create_index_concurrently(connection, name, definition):
+    """CREATE INDEX CONCURRENTLY `name` ON `definition`, unless a valid index `name` exists.
+
+    A concurrent build that fails or is cancelled leaves an invalid index
+    behind, which the planner ignores and IF NOT EXISTS would skip forever;
+    it is dropped and built again. An in-progress build looks invalid too, so
+    the builder holds an advisory lock on the name and anyone who can't take
+    it leaves the index to them. (Waiting for the lock would deadlock: the
+    concurrent build waits for every open transaction, the waiter's included.)
+    Returns False if another session was building it.
+    """
+    with connection() as conn:
+        # CREATE/DROP INDEX CONCURRENTLY can't run inside a transaction block.
+        conn.autocommit = True
+        try:
+            c = conn.cursor()
+            c.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (name,))
+            if not c.fetchone()[0]:
+                return False
+            try:
+                c.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+                row = c.fetchone()
+                if row is not None and not row[0]:
+                    c.execute(f"DROP INDEX CONCURRENTLY {name}")
+                c.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+            finally:
+                c.execute("SELECT pg_advisory_unlock(hashtext(%s))", (name,))
+        finally:
+            conn.autocommit = False
+    return True
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Form keys that drive routing or the download name but not the PDF content.
+NON_CONTENT_FIELDS = ("action", "draft_name")
+
+
+class PDFCache:
+    """Content-addressed cache of rendered PDFs.
+
+    Entries live in an in-memory LRU bounded by total bytes and, when
+    `disk_dir` is set, in a second on-disk tier shared by every worker on the
+    host. The disk tier evicts least-recently-used files once it grows past
+    `disk_bytes`. Other rendered artefacts (draft previews) are stored the
+    same way under a different file `suffix`.
+    """
+
+    def __init__(self, memory_bytes=64 * 1024 * 1024, disk_dir=None, disk_bytes=512 * 1024 * 1024, suffix=".pdf"):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._size = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def content_key(data, template_version):
+        """Canonical hash of the submitted fields plus the template version."""
+        fields = {k: v for k, v in data.items() if k not in NON_CONTENT_FIELDS and v}
+        payload = json.dumps([template_version, fields], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            pdf_bytes = self._entries.get(key)
+            if pdf_bytes is not None:
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return pdf_bytes
+        pdf_bytes = self._read_disk(key)
+        with self._lock:
+            if pdf_bytes is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._store_memory(key, pdf_bytes)
+        return pdf_bytes
+
+    def put(self, key, pdf_bytes):
+        with self._lock:
+            self._store_memory(key, pdf_bytes)
+        self._write_disk(key, pdf_bytes)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._entries)
+            stats["memory_bytes"] = self._size
+        return stats
+
+    def _store_memory(self, key, pdf_bytes):
+        if len(pdf_bytes) > self.memory_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = pdf_bytes
+        self._size += len(pdf_bytes)
+        while self._size > self.memory_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+            self._stats["evictions"] += 1
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key + self.suffix)
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                pdf_bytes = f.read()
+            os.utime(path)
+        except OSError:
+            return None
+        return pdf_bytes
+
+    def _write_disk(self, key, pdf_bytes):
+        if not self.disk_dir or len(pdf_bytes) > self.disk_bytes:
+            return
+        os.makedirs(self.disk_dir, exist_ok=True)
+        # Write to a temp file and rename so readers in other workers never
+        # see a partially written PDF.
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf_bytes)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        files = []
+        total = 0
+        with os.scandir(self.disk_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(self.suffix):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+        if total <= self.disk_bytes:
+            return
+        files.sort()
+        for _, size, path in files:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self._stats["evictions"] += 1
+            if total <= self.disk_bytes:
+                break
@@ -0,0 +1,335 @@
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfdoc
+from reportlab.lib import colors
+import hashlib
+import os
+import io
+import threading
+from collections import namedtuple
+
+from pdfrw import PdfReader
+from pdfrw.buildxobj import pagexobj, ViewInfo
+from pdfrw.toreportlab import makerl
+
+import htmlrender
+from formschema import FORM, FieldBoxes, NumberedBoxes, OptionsTable, PageBreak, field_text
+from imageregistry import images
+from metrics import histogram, timed
+from textlayout import layout_text, draw_layout
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+OVERLAY_ICON_PATH = os.path.join(STATIC_DIR, "overlay_icon.png")
+LOGO_PATH = os.path.join(STATIC_DIR, "logo.png")
+TEMPLATE_PDF_PATH = os.path.join(STATIC_DIR, "Strategic_Topic_Summary.pdf")
+# Files drawn into every PDF. Their contents are part of render_variant(),
+# so replacing the logo (say) changes cache keys and ETags.
+RENDER_ASSETS = (LOGO_PATH, OVERLAY_ICON_PATH, TEMPLATE_PDF_PATH, htmlrender.PRINT_CSS_PATH)
+
+PDF_PHASE_SECONDS = histogram("pdf_render_phase_seconds", "Time spent in each phase of PDF generation.")
+
+# "redraw" draws the header band and logos with canvas calls; "overlay" lifts
+# them from the static template PDF and only draws the form content.
+RENDER_MODE = os.environ.get("PDF_RENDER_MODE", "redraw")
+
+# Bump whenever the drawing code changes so cached PDFs are not reused.
+TEMPLATE_VERSION = "2"
+
+# "standard" keeps ReportLab's defaults. "compact" is for PDFs downloaded or
+# archived in bulk: images are embedded at image_dpi for their drawn size
+# (the footer logo is a 6000px PNG drawn 80pt wide) and streams are written
+# as binary Flate data without the ASCII85 wrapper. Compact renders always
+# draw the header and footer themselves, since the template overlay carries
+# the full-size images.
+OutputProfile = namedtuple("OutputProfile", "name image_dpi ascii85")
+OUTPUT_PROFILES = {
+    "standard": OutputProfile("standard", None, True),
+    "compact": OutputProfile("compact", 300, False),
+}
+OUTPUT_PROFILE = os.environ.get("PDF_OUTPUT_PROFILE", "standard")
+
+# --- PDF utilities ---
+def render_pdf(data, mode=None, profile=None, renderer=None):
+    """Render the Strategic Topic Summary for a submitted form; returns PDF bytes."""
+    buffer = io.BytesIO()
+    write_pdf(data, buffer, mode=mode, profile=profile, renderer=renderer)
+    return buffer.getvalue()
+
+def write_pdf(data, output, plan=None, mode=None, profile=None, renderer=None):
+    """Render the Strategic Topic Summary into the writable file object `output`.
+
+    `profile` names an entry of OUTPUT_PROFILES (default OUTPUT_PROFILE) and
+    `renderer` one of RENDERERS (default PDF_RENDERER).
+    """
+    RENDERERS[renderer or PDF_RENDERER].write(data, output, plan or LAYOUT_PLAN, mode or RENDER_MODE,
+                                              OUTPUT_PROFILES[profile or OUTPUT_PROFILE])
+
+def render_variant(profile=None, renderer=None):
+    """Everything besides the form data that determines the rendered bytes, for cache keys."""
+    renderer = RENDERERS[renderer or PDF_RENDERER]
+    mode = f":{RENDER_MODE}" if renderer.name == "reportlab" else ""
+    assets = ",".join(asset_digest(path) for path in RENDER_ASSETS)
+    return f"{renderer.name}:{renderer.version}{mode}:{profile or OUTPUT_PROFILE}:{assets}"
+
+_asset_digests = {}
+
+def asset_digest(path):
+    """Short content hash of `path`, re-read only when its mtime changes; "" if it is missing."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return ""
+    cached = _asset_digests.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, "rb") as f:
+            cached = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+        _asset_digests[path] = cached
+    return cached[1]
+
+def write_reportlab_pdf(data, output, plan, mode, profile):
+    """The ReportLab backend: draws the form from the compiled LayoutPlan."""
+    # The static template only matches the default form.
+    overlay = template_overlay if mode == "overlay" and plan.schema is FORM and profile.image_dpi is None else None
+    with timed(PDF_PHASE_SECONDS, renderer="reportlab", phase="layout"):
+        layouts = [op.layout(data) for op in plan.ops]
+    if profile.ascii85:
+        p = canvas.Canvas(output, pagesize=plan.pagesize)
+    else:
+        p = BinaryStreamCanvas(output, pagesize=plan.pagesize, pageCompression=1)
+    with timed(PDF_PHASE_SECONDS, renderer="reportlab", phase="images"):
+        if overlay:
+            overlay.draw_header(p)
+            p.setFillColor(colors.black)
+        else:
+            plan.draw_header(p, profile)
+    with timed(PDF_PHASE_SECONDS, renderer="reportlab", phase="draw"):
+        y = plan.first_y
+        for op, layout in zip(plan.ops, layouts):
+            y = op.draw(p, layout, y, plan)
+    with timed(PDF_PHASE_SECONDS, renderer="reportlab", phase="images"):
+        if overlay:
+            overlay.draw_footer(p)
+        else:
+            images.draw(p, LOGO_PATH, 50, 20, width=80, height=30,  # Adjust size/position as needed
+                        dpi=profile.image_dpi, ascii85=profile.ascii85)
+    with timed(PDF_PHASE_SECONDS, renderer="reportlab", phase="save"):
+        p.save()
+
+class BinaryStreamCanvas(canvas.Canvas):
+    """Canvas whose page content streams are Flate-compressed without ASCII85.
+
+    ReportLab only reads rl_config.useA85 globally; setting each page's
+    stream here keeps the choice per document.
+    """
+
+    def showPage(self):
+        super().showPage()
+        page = self._doc.Pages.pages[-1]
+        stream = pdfdoc.PDFStream(content=page.stream, filters=[pdfdoc.PDFZCompress])
+        stream.__Comment__ = "page stream"
+        page.Contents = stream
+
+# PDF backends, selectable per request or with PDF_RENDERER. `write` is
+# called as write(data, output, plan, mode, profile) with a LayoutPlan and an
+# OutputProfile; `version` changes whenever its output does.
+Renderer = namedtuple("Renderer", "name version write")
+RENDERERS = {
+    "reportlab": Renderer("reportlab", TEMPLATE_VERSION, write_reportlab_pdf),
+    "weasyprint": Renderer("weasyprint", htmlrender.TEMPLATE_VERSION, htmlrender.write_pdf),
+}
+PDF_RENDERER = os.environ.get("PDF_RENDERER", "reportlab")
+
+# --- Static template overlay ---
+
+class TemplateOverlay:
+    """Header band and footer logo taken from the static template PDF.
+
+    The template is parsed with pdfrw once (and again only if the file
+    changes); its header and footer strips become Form XObjects that each
+    render stamps onto its pages, with the already-compressed image data
+    copied through as-is.
+    """
+
+    HEADER_HEIGHT = 70
+    FOOTER_HEIGHT = 60
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._header = None
+        self._footer = None
+
+    def _load(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            pages = PdfReader(self.path).pages
+            width = float(pages[0].inheritable.MediaBox[2])
+            height = float(pages[-1].inheritable.MediaBox[3])
+            # pdfrw viewrects are (left, top, width, height) measured from the top.
+            self._header = pagexobj(pages[0], ViewInfo(viewrect=[0, 0, width, self.HEADER_HEIGHT]))
+            self._footer = pagexobj(pages[-1], ViewInfo(viewrect=[0, height - self.FOOTER_HEIGHT, width, self.FOOTER_HEIGHT]))
+            self._mtime = mtime
+
+    def draw_header(self, p):
+        self._load()
+        p.doForm(makerl(p, self._header))
+
+    def draw_footer(self, p):
+        self._load()
+        p.doForm(makerl(p, self._footer))
+
+template_overlay = TemplateOverlay(TEMPLATE_PDF_PATH)
+
+# --- Layout plan ---
+# A FormSchema is compiled once into a LayoutPlan: a list of drawing ops with
+# every position, width, label and field key worked out up front, so a
+# render only wraps the submitted text and draws. Each op wraps its text in
+# layout(data), independent of page position, then draws in draw().
+
+BOTTOM_MARGIN = 60
+
+class LayoutPlan:
+    def __init__(self, schema, pagesize):
+        self.schema = schema
+        self.pagesize = pagesize
+        self.width, self.height = pagesize
+        self.first_y = self.height - 90
+        self.continued_y = self.height - 50
+        self.ops = []
+        for section in schema.sections:
+            if isinstance(section, FieldBoxes):
+                self.ops.extend(FieldBoxOp(field.label, field.key, self.width, section.gap_after)
+                                for field in section.fields)
+            elif isinstance(section, PageBreak):
+                self.ops.append(PageBreakOp())
+            elif isinstance(section, OptionsTable):
+                self.ops.append(OptionsTableOp(section, self.width))
+            elif isinstance(section, NumberedBoxes):
+                self.ops.append(NumberedBoxesOp(section, self.width))
+            else:
+                raise TypeError(f"unknown form section {section!r}")
+
+    def draw_header(self, p, profile=OUTPUT_PROFILES["standard"]):
+        width, height = self.width, self.height
+        p.setFillColorRGB(0.15, 0.18, 0.25)
+        p.rect(0, height - 70, width, 70, fill=1, stroke=0)
+        p.setFillColor(colors.white)
+        p.setFont("Helvetica-Bold", 14)
+        p.drawString(50, height - 30, self.schema.organisation)
+        p.setFont("Helvetica-Bold", 16)
+        p.drawString(50, height - 50, self.schema.title)
+        images.draw(p, OVERLAY_ICON_PATH, width - 70, height - 60, width=40, height=40,
+                    dpi=profile.image_dpi, ascii85=profile.ascii85)
+        p.setFillColor(colors.black)
+
+    def make_room(self, p, y, needed):
+        """Start a new page if `needed` points don't fit above the bottom margin."""
+        if y - needed < BOTTOM_MARGIN:
+            p.showPage()
+            return self.continued_y
+        return y
+
+class PageBreakOp:
+    def layout(self, data):
+        return None
+
+    def draw(self, p, layout, y, plan):
+        p.showPage()
+        return plan.first_y
+
+class FieldBoxOp:
+    def __init__(self, label, key, page_width, gap_after):
+        self.label = label
+        self.key = key
+        self.box_width = page_width - 100
+        self.text_width = page_width - 110
+        self.gap_after = gap_after
+
+    def layout(self, data):
+        return layout_text(field_text(data, self.key), self.text_width)
+
+    def draw(self, p, layout, y, plan):
+        box_height = layout.height + 10
+        y = plan.make_room(p, y, box_height)
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(50, y, self.label)
+        p.rect(50, y - box_height - 5, self.box_width, box_height, stroke=1, fill=0)
+        draw_layout(p, 55, y - 20, layout)
+        return y - (box_height + self.gap_after)
+
+class OptionsTableOp:
+    def __init__(self, table, page_width):
+        self.title = table.title
+        n_columns = len(table.columns)
+        self.col_width = (page_width - 100) / (n_columns + 1)
+        self.text_width = self.col_width - 10
+        self.headers = [(50 + self.col_width * (i + 1), header) for i, header in enumerate(table.columns)]
+        self.rows = [
+            (layout_text(row, self.text_width, "Helvetica-Bold", 11),
+             [(50 + self.col_width * col, table.key_format.format(col=col, row=row))
+              for col in range(1, n_columns + 1)])
+            for row in table.rows
+        ]
+
+    def layout(self, data):
+        return [[layout_text(field_text(data, key), self.text_width) for _, key in cells] for _, cells in self.rows]
+
+    def draw(self, p, row_layouts, y, plan):
+        col_width = self.col_width
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(50, y, self.title)
+        y -= 20
+        p.setFont("Helvetica-Bold", 11)
+        # Each row's cell borders are stroked as one path (one "S" operator
+        # for all of its rectangles) rather than one stroke per cell.
+        borders = p.beginPath()
+        borders.rect(50, y - 20, col_width, 20)
+        for x, header in self.headers:
+            borders.rect(x, y - 20, col_width, 20)
+            p.drawCentredString(x + col_width / 2, y - 15, header)
+        p.drawPath(borders, stroke=1, fill=0)
+        y -= 30
+
+        for (label_layout, cells), layouts in zip(self.rows, row_layouts):
+            row_h = max(layout.height for layout in layouts) + 30
+            y = plan.make_room(p, y, row_h)
+            borders = p.beginPath()
+            borders.rect(50, y - row_h, col_width, row_h)
+            draw_layout(p, 55, y - 20, label_layout)
+            for (x, _), layout in zip(cells, layouts):
+                borders.rect(x, y - row_h, col_width, row_h)
+                draw_layout(p, x + 5, y - 20, layout)
+            p.drawPath(borders, stroke=1, fill=0)
+            y -= (row_h + 18)
+        return y
+
+class NumberedBoxesOp:
+    def __init__(self, section, page_width):
+        self.title = section.title
+        self.items = [(f"{i}.", section.key_format.format(i=i)) for i in range(1, section.count + 1)]
+        self.box_width = page_width - 120
+        self.text_width = page_width - 130
+
+    def layout(self, data):
+        return [layout_text(field_text(data, key), self.text_width) for _, key in self.items]
+
+    def draw(self, p, layouts, y, plan):
+        p.setFont("Helvetica-Bold", 12)
+        p.drawString(50, y, self.title)
+        y -= 10
+        for (number, _), layout in zip(self.items, layouts):
+            box_height = layout.height + 10
+            y = plan.make_room(p, y, box_height)
+            p.setFont("Helvetica-Bold", 10)
+            p.drawString(55, y - 15, number)
+            p.rect(75, y - box_height - 5, self.box_width, box_height, stroke=1, fill=0)
+            draw_layout(p, 80, y - 20, layout)
+            y -= (box_height + 15)
+        return y
+
+LAYOUT_PLAN = LayoutPlan(FORM, letter)
@@ -0,0 +1,156 @@
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pdfrender import render_pdf
+
+JOB_ID_RE = re.compile(r"[0-9a-f]{32}")
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _update_job(job_dir, job_id, **fields):
+    path = os.path.join(job_dir, job_id + ".json")
+    with open(path, "rb") as f:
+        job = json.load(f)
+    job.update(fields)
+    _write_atomic(path, json.dumps(job).encode("utf-8"))
+    return job
+
+
+def _render_job(job_dir, job_id, data, profile=None, renderer=None):
+    """Process-pool entry point: render one job and write its PDF next to the record."""
+    _update_job(job_dir, job_id, status="running", started=time.time())
+    pdf_bytes = render_pdf(data, profile=profile, renderer=renderer)
+    _write_atomic(os.path.join(job_dir, job_id + ".pdf"), pdf_bytes)
+    return len(pdf_bytes)
+
+
+class RenderJobQueue:
+    """Renders PDFs on a local process pool, tracking jobs as files in `job_dir`.
+
+    Job records are small JSON files, so any gunicorn worker on the host can
+    report status or serve the result, while only the worker that accepted a
+    job runs it. At most `max_pending` jobs are queued or running per worker;
+    beyond that submit() raises QueueFull.
+    """
+
+    def __init__(self, job_dir, max_workers=None, max_pending=16, ttl=3600):
+        self.job_dir = job_dir
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._pending = 0
+
+    def _get_executor(self):
+        # An executor inherited across fork has no live workers in the child.
+        if self._pid != os.getpid():
+            self._executor = None
+            self._pid = os.getpid()
+            self._pending = 0
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _discard(self, executor):
+        """Drop a broken pool; the next submit starts a fresh one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def submit(self, data, filename, profile=None, renderer=None):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull(f"{self._pending} render jobs already pending")
+            executor = self._get_executor()
+            self._pending += 1
+        os.makedirs(self.job_dir, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "status": "queued", "filename": filename, "created": time.time()}
+        try:
+            _write_atomic(os.path.join(self.job_dir, job_id + ".json"), json.dumps(job).encode("utf-8"))
+            try:
+                future = executor.submit(_render_job, self.job_dir, job_id, data, profile, renderer)
+            except BrokenProcessPool:
+                # It broke while idle, so no job's callback has replaced it.
+                self._discard(executor)
+                with self._lock:
+                    executor = self._get_executor()
+                future = executor.submit(_render_job, self.job_dir, job_id, data, profile, renderer)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(lambda f: self._finished(job_id, f, executor))
+        self._purge_expired()
+        return job_id
+
+    def _finished(self, job_id, future, executor):
+        error = future.exception()
+        with self._lock:
+            self._pending -= 1
+        if isinstance(error, BrokenProcessPool):
+            # A worker died. Every job on the pool fails, possibly after a new
+            # pool has started, so this only drops the pool the job ran on.
+            self._discard(executor)
+        if error is None:
+            _update_job(self.job_dir, job_id, status="done", finished=time.time())
+        else:
+            _update_job(self.job_dir, job_id, status="failed", finished=time.time(), error=repr(error))
+
+    def status(self, job_id):
+        if not JOB_ID_RE.fullmatch(job_id):
+            return None
+        try:
+            with open(os.path.join(self.job_dir, job_id + ".json"), "rb") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def result_path(self, job_id):
+        job = self.status(job_id)
+        if job is None or job["status"] != "done":
+            return None
+        return os.path.join(self.job_dir, job_id + ".pdf")
+
+    def stats(self):
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending, "workers": self.max_workers}
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl
+        with os.scandir(self.job_dir) as it:
+            for entry in it:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    continue
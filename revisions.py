@@ -0,0 +1,130 @@
+"""Draft revision history stored as field-level deltas.
+
+An AFTER trigger on drafts records a draft_revisions row for every write to
+drafts.content, so every writer (form saves, autosave, bulk import, the
+async app) is covered without extra round trips. A revision holds only the
+fields changed and removed since the previous version. The first revision
+recorded for a draft, and every SNAPSHOT_INTERVAL-th version, also holds the
+full content, so rebuilding any version reads at most SNAPSHOT_INTERVAL
+rows. drafts still holds the current content: loading a draft stays a
+single-row read.
+
+Revisions are deleted with their draft.
+"""
+
+SNAPSHOT_INTERVAL = 20
+
+
+def install_revision_trigger(conn):
+    """Create the draft_revisions table and the trigger that fills it (safe to run repeatedly)."""
+    c = conn.cursor()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS draft_revisions (
+            draft_id INTEGER NOT NULL REFERENCES drafts (id) ON DELETE CASCADE,
+            version INTEGER NOT NULL,
+            created TIMESTAMPTZ NOT NULL DEFAULT now(),
+            changed JSONB,
+            removed TEXT[] NOT NULL DEFAULT '{}',
+            snapshot JSONB,
+            PRIMARY KEY (draft_id, version)
+        )
+    """)
+    c.execute(f"""
+        CREATE OR REPLACE FUNCTION drafts_record_revision() RETURNS trigger AS $$
+        DECLARE
+            changed JSONB;
+            removed TEXT[];
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO draft_revisions (draft_id, version, snapshot)
+                VALUES (NEW.id, NEW.version, NEW.content)
+                ON CONFLICT (draft_id, version) DO UPDATE SET snapshot = EXCLUDED.snapshot, created = now();
+                RETURN NULL;
+            END IF;
+            IF NEW.version = OLD.version AND NEW.content = OLD.content THEN
+                RETURN NULL;
+            END IF;
+            -- Drafts written before history was kept start with a snapshot
+            -- of the version being replaced.
+            INSERT INTO draft_revisions (draft_id, version, snapshot)
+            VALUES (OLD.id, OLD.version, OLD.content)
+            ON CONFLICT (draft_id, version) DO NOTHING;
+            SELECT jsonb_object_agg(key, value) INTO changed
+            FROM jsonb_each(NEW.content) AS new_field
+            WHERE OLD.content -> key IS DISTINCT FROM value;
+            SELECT array_agg(key) INTO removed
+            FROM jsonb_object_keys(OLD.content) AS key
+            WHERE NOT NEW.content ? key;
+            -- A write that didn't bump the version replaces that revision's
+            -- content outright, so the chain still rebuilds to what is stored.
+            INSERT INTO draft_revisions (draft_id, version, changed, removed, snapshot)
+            VALUES (NEW.id, NEW.version, coalesce(changed, '{{}}'), coalesce(removed, '{{}}'),
+                    CASE WHEN NEW.version % {SNAPSHOT_INTERVAL} = 0 THEN NEW.content END)
+            ON CONFLICT (draft_id, version) DO UPDATE SET snapshot = NEW.content, created = now();
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    c.execute("SELECT 1 FROM pg_trigger WHERE tgrelid = 'drafts'::regclass AND tgname = 'drafts_record_revision'")
+    if c.fetchone() is None:
+        c.execute("""
+            CREATE TRIGGER drafts_record_revision AFTER INSERT OR UPDATE OF content ON drafts
+            FOR EACH ROW EXECUTE FUNCTION drafts_record_revision()
+        """)
+
+
+LIST_REVISIONS_SQL = """
+    SELECT r.version, r.created, ARRAY(SELECT jsonb_object_keys(r.changed)), r.removed, r.snapshot IS NOT NULL
+    FROM draft_revisions r JOIN drafts d ON d.id = r.draft_id
+    WHERE d.name = %s AND r.version < %s
+    ORDER BY r.version DESC
+    LIMIT %s
+"""
+
+# The revision and everything back to the nearest snapshot at or before it.
+REVISION_CHAIN_SQL = """
+    WITH draft AS (SELECT id FROM drafts WHERE name = %(name)s),
+    base AS (
+        SELECT max(r.version) AS version FROM draft_revisions r, draft
+        WHERE r.draft_id = draft.id AND r.version <= %(version)s AND r.snapshot IS NOT NULL
+    )
+    SELECT r.version, r.changed, r.removed, r.snapshot FROM draft_revisions r, draft, base
+    WHERE r.draft_id = draft.id AND r.version BETWEEN base.version AND %(version)s
+    ORDER BY r.version
+"""
+
+
+def list_revisions_query(name, before=None, limit=50):
+    """Newest first; `before` is the last version of the previous page."""
+    return LIST_REVISIONS_SQL, (name, before if before is not None else 2 ** 31 - 1, limit)
+
+
+def revision_summary(row):
+    version, created, changed, removed, snapshot = row
+    return {"version": version, "created": created.isoformat(), "changed": sorted(changed),
+            "removed": sorted(removed), "snapshot": snapshot}
+
+
+def revision_chain_query(name, version):
+    return REVISION_CHAIN_SQL, {"name": name, "version": version}
+
+
+def rebuild_revision(rows, version):
+    """Apply a REVISION_CHAIN_SQL result; returns the content at `version`, or None if there is no such revision."""
+    if not rows or rows[-1][0] != version:
+        return None
+    content = {}
+    for _, changed, removed, snapshot in rows:
+        if snapshot is not None:
+            content = dict(snapshot)
+            continue
+        content.update(changed or {})
+        for key in removed:
+            content.pop(key, None)
+    return content
+
+
+def diff_revisions(old, new):
+    """Field-by-field differences between two draft contents, as [{"field", "from", "to"}]."""
+    return [{"field": key, "from": old.get(key), "to": new.get(key)}
+            for key in sorted(old.keys() | new.keys()) if old.get(key) != new.get(key)]
@@ -0,0 +1,69 @@
+"""The compact PDF profile must look like the standard one while being much smaller, and no slower."""
+import time
+
+import pypdfium2
+import pytest
+from PIL import ImageChops
+
+from benchmarks.drafts import sample_draft
+from pdfrender import render_pdf
+
+# Compact embeds images at 300 dpi, so only the downsampled footer logo may
+# differ, and only slightly: a channel difference of at most MAX_DIFFERENCE
+# on at most MAX_CHANGED_FRACTION of a page rasterised at 72 dpi.
+MAX_DIFFERENCE = 48
+MAX_CHANGED_FRACTION = 0.001
+# Compact reuses the prepared, downsampled images and is normally faster;
+# the margin only absorbs timing noise. Each profile's best of TIMING_RUNS
+# warm renders is compared.
+MAX_SLOWDOWN = 1.5
+TIMING_RUNS = 5
+
+
+def rasterise(pdf_bytes):
+    document = pypdfium2.PdfDocument(pdf_bytes)
+    try:
+        return [document[i].render(scale=1).to_pil().convert("L") for i in range(len(document))]
+    finally:
+        document.close()
+
+
+def best_render_seconds(draft, profile):
+    timings = []
+    for _ in range(TIMING_RUNS):
+        start = time.perf_counter()
+        render_pdf(draft, profile=profile)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+@pytest.fixture(scope="module")
+def draft():
+    return sample_draft(60)
+
+
+@pytest.fixture(scope="module")
+def renders(draft):
+    return {profile: render_pdf(draft, profile=profile) for profile in ("standard", "compact")}
+
+
+def test_compact_is_smaller(renders):
+    assert len(renders["compact"]) * 10 < len(renders["standard"])
+
+
+def test_compact_is_pixel_equivalent(renders):
+    standard = rasterise(renders["standard"])
+    compact = rasterise(renders["compact"])
+    assert len(compact) == len(standard)
+    for page, (expected, actual) in enumerate(zip(standard, compact), 1):
+        assert actual.size == expected.size, f"page {page}"
+        histogram = ImageChops.difference(expected, actual).histogram()
+        assert max(i for i, count in enumerate(histogram) if count) <= MAX_DIFFERENCE, f"page {page}"
+        changed = sum(histogram[16:]) / (expected.width * expected.height)
+        assert changed <= MAX_CHANGED_FRACTION, f"page {page}"
+
+
+def test_compact_is_not_slower(draft, renders):
+    standard = best_render_seconds(draft, "standard")
+    compact = best_render_seconds(draft, "compact")
+    assert compact <= standard * MAX_SLOWDOWN, f"compact {compact:.3f}s, standard {standard:.3f}s"
@@ -0,0 +1,85 @@
+import os
+from functools import lru_cache
+
+from reportlab.pdfbase.pdfmetrics import getFont
+
+WORD_WIDTH_CACHE_SIZE = int(os.environ.get("WORD_WIDTH_CACHE_SIZE", 16384))
+
+
+@lru_cache(maxsize=None)
+def font_metrics(font_name, font_size):
+    """Return (font, space_width) for a font/size pair, resolved once per process."""
+    font = getFont(font_name)
+    return font, font.stringWidth(" ", font_size)
+
+
+@lru_cache(maxsize=WORD_WIDTH_CACHE_SIZE)
+def word_width(word, font_name, font_size):
+    font, _ = font_metrics(font_name, font_size)
+    return font.stringWidth(word, font_size)
+
+
+def measure_cache_info():
+    return {"word_widths": word_width.cache_info(), "fonts": font_metrics.cache_info()}
+
+
+class LineLayout:
+    """Result of wrapping one string to a fixed width.
+
+    `lines` and `widths` line up index for index; `height` is the height of
+    the text block (lines * line_height), without any box padding.
+    """
+
+    __slots__ = ("lines", "widths", "line_height", "font_name", "font_size")
+
+    def __init__(self, lines, widths, line_height, font_name, font_size):
+        self.lines = lines
+        self.widths = widths
+        self.line_height = line_height
+        self.font_name = font_name
+        self.font_size = font_size
+
+    @property
+    def height(self):
+        return len(self.lines) * self.line_height
+
+    def __len__(self):
+        return len(self.lines)
+
+
+def layout_text(text, max_width, font_name="Helvetica", font_size=10, line_height=14):
+    """Greedy word wrap that measures every word once.
+
+    Line widths are accumulated from the word widths plus one space width per
+    gap, so a paragraph is wrapped in linear time instead of re-measuring the
+    growing line for each word.
+    """
+    space_width = font_metrics(font_name, font_size)[1]
+    lines = []
+    widths = []
+    current_words = []
+    current_width = 0.0
+    for word in text.split():
+        width = word_width(word, font_name, font_size)
+        test_width = current_width + space_width + width if current_words else width
+        if test_width <= max_width:
+            current_words.append(word)
+            current_width = test_width
+        else:
+            lines.append(" ".join(current_words))
+            widths.append(current_width)
+            current_words = [word]
+            current_width = width
+    if current_words:
+        lines.append(" ".join(current_words))
+        widths.append(current_width)
+    return LineLayout(lines, widths, line_height, font_name, font_size)
+
+
+def draw_layout(p, x, y, layout):
+    """Draw a precomputed layout top-down from (x, y); returns the height used."""
+    p.setFont(layout.font_name, layout.font_size)
+    for line in layout.lines:
+        p.drawString(x, y, line)
+        y -= layout.line_height
+    return layout.height
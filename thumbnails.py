@@ -0,0 +1,131 @@
+"""First-page PNG thumbnails of drafts.
+
+A thumbnail is page one of the PDF a download would produce, rasterised
+with pdfium. It is stored under a hash of the draft's content, the render
+variant and the width, so an edited draft simply has a new key and a stale
+thumbnail is never served; old ones age out of the store.
+
+ThumbnailQueue renders them on a process pool, off the request path: the
+app schedules a draft when it is saved, and a request for a thumbnail that
+isn't stored yet schedules it too.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from metrics import histogram, timed
+from pdfcache import PDFCache
+from pdfrender import render_pdf, render_variant
+
+log = logging.getLogger(__name__)
+
+# Bump whenever rasterising changes so stored thumbnails are not reused.
+THUMBNAIL_VERSION = "1"
+# Images are downsampled anyway, so render the cheaper compact PDF.
+THUMBNAIL_PROFILE = "compact"
+THUMBNAIL_COLORS = 64
+
+THUMBNAIL_SECONDS = histogram("thumbnail_render_seconds", "Time to render a draft thumbnail in the pool.")
+
+
+def thumbnail_key(data, width):
+    variant = f"thumbnail:{THUMBNAIL_VERSION}:{width}:{render_variant(THUMBNAIL_PROFILE)}"
+    return PDFCache.content_key(data, variant)
+
+
+def render_thumbnail(data, width):
+    """Render page one of the draft's PDF as a `width`-pixel-wide palette PNG; returns PNG bytes."""
+    import pypdfium2
+
+    document = pypdfium2.PdfDocument(render_pdf(data, profile=THUMBNAIL_PROFILE))
+    try:
+        page = document[0]
+        image = page.render(scale=width / page.get_width()).to_pil()
+    finally:
+        document.close()
+    buffer = io.BytesIO()
+    image.convert("RGB").quantize(THUMBNAIL_COLORS).save(buffer, "PNG", optimize=True)
+    return buffer.getvalue()
+
+
+class ThumbnailQueue:
+    """Renders draft thumbnails into `store` (a PDFCache) on a local process pool.
+
+    `load(name)` returns a draft's (content, version), with version 0 if it
+    doesn't exist. Scheduling is by name and the content is read when the
+    render starts, so a draft saved again while it waits is rendered once,
+    in its latest state. At most `max_pending` drafts wait per worker; beyond
+    that schedule() drops them, and they are rendered when next requested.
+    """
+
+    def __init__(self, store, load, width=240, max_workers=1, max_pending=64):
+        self.store = store
+        self.load = load
+        self.width = width
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._waiting = set()
+        self._threads = None
+        self._processes = None
+        self._pid = None
+
+    def _get_executors(self):
+        # Executors inherited across fork have no live workers in the child.
+        if self._pid != os.getpid():
+            self._threads = ThreadPoolExecutor(self.max_workers, thread_name_prefix="thumbnail")
+            self._processes = None
+            self._pid = os.getpid()
+            self._waiting = set()
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._threads
+
+    def key(self, data):
+        return thumbnail_key(data, self.width)
+
+    def schedule(self, name):
+        """Queue a render of draft `name`; returns False if the queue is full."""
+        with self._lock:
+            threads = self._get_executors()
+            if name in self._waiting:
+                return True
+            if len(self._waiting) >= self.max_pending:
+                return False
+            self._waiting.add(name)
+        threads.submit(self._render, name)
+        return True
+
+    def _render(self, name):
+        with self._lock:
+            self._waiting.discard(name)
+            # Starts a fresh pool if the last one broke.
+            self._get_executors()
+            processes = self._processes
+        try:
+            data, version = self.load(name)
+            if not version:
+                return
+            key = self.key(data)
+            if self.store.get(key) is not None:
+                return
+            with timed(THUMBNAIL_SECONDS):
+                png = processes.submit(render_thumbnail, data, self.width).result()
+            self.store.put(key, png)
+        except BrokenProcessPool:
+            log.warning("thumbnail pool broke while rendering %r; restarting it", name)
+            # Renders already waiting for a pool start a fresh one.
+            with self._lock:
+                if self._processes is processes:
+                    self._processes = None
+            processes.shutdown(wait=False)
+        except Exception:
+            log.exception("could not render thumbnail for %r", name)
+
+    def stats(self):
+        with self._lock:
+            return {"pending": len(self._waiting), "max_pending": self.max_pending, "workers": self.max_workers}